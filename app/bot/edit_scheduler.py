@@ -0,0 +1,199 @@
+import asyncio
+from dataclasses import dataclass, fields
+from typing import Dict, Hashable, Optional, Set
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.types import InlineKeyboardMarkup
+
+from app.core.config import TelegramLimitsConfig
+from app.core.logger import get_logger
+from app.core.rate_limit import TokenBucket
+
+
+logger = get_logger('edit_scheduler')
+
+CHAT_BUCKETS_PRUNE_SIZE = 10_000
+
+
+@dataclass
+class PendingEdit:
+    chat_id: int
+    message_id: int
+    text: str
+    reply_markup: Optional[InlineKeyboardMarkup]
+
+
+@dataclass
+class EditStats:
+    submitted: int = 0
+    coalesced: int = 0
+    deferred: int = 0
+    sent: int = 0
+    retry_after: int = 0
+    discarded: int = 0
+    failed: int = 0
+    messages: int = 0
+
+    def as_log(self) -> str:
+        return ' '.join(f'{f.name}={getattr(self, f.name)}' for f in fields(self))
+
+
+class EditScheduler:
+    """Outbound queue for `edit_message_text` with coalescing and rate limits.
+
+    Pending edits are keyed by the caller (one key per edited message): a newer
+    submit replaces the queued text. Sending respects a per-chat and a global
+    token bucket and backs off for the whole chat on RetryAfter. New messages
+    sent through `send_message` spend the same budget. Replicas that split
+    the work call `set_global_share` so that together they stay within the
+    bot-wide global rate.
+    """
+
+    def __init__(self, bot: Bot, limits: TelegramLimitsConfig) -> None:
+        self.bot = bot
+        self.limits = limits
+        self.stats = EditStats()
+        self._global = TokenBucket(limits.global_rate, limits.global_rate)
+        self._chats: Dict[int, TokenBucket] = {}
+        self._pending: Dict[Hashable, PendingEdit] = {}
+        # правки, которые сейчас отправляются; discard убирает ключ, и повтор после RetryAfter не нужен
+        self._sending: Dict[Hashable, PendingEdit] = {}
+        self._deferred: Set[Hashable] = set()
+        self._in_flight: Set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def submit(
+        self,
+        key: Hashable,
+        chat_id: int,
+        message_id: int,
+        text: str,
+        reply_markup: Optional[InlineKeyboardMarkup] = None,
+    ) -> None:
+        self.stats.submitted += 1
+        if key in self._pending:
+            self.stats.coalesced += 1
+        self._pending[key] = PendingEdit(chat_id, message_id, text, reply_markup)
+        self._wakeup.set()
+
+    def discard(self, key: Hashable) -> None:
+        if self._pending.pop(key, None) is not None:
+            self.stats.discarded += 1
+        self._sending.pop(key, None)
+        self._deferred.discard(key)
+
+    def set_global_share(self, share: float) -> None:
+        """Use only `share` (0..1] of TELEGRAM_GLOBAL_RATE in this process."""
+        rate = self.limits.global_rate * min(max(share, 0.01), 1.0)
+        self._global.set_rate(rate, max(rate, 1.0))
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= CHAT_BUCKETS_PRUNE_SIZE:
+                self._chats = {cid: b for cid, b in self._chats.items() if not b.idle}
+            bucket = TokenBucket(self.limits.chat_rate, self.limits.chat_burst)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _dispatch(self) -> float:
+        """Start every edit allowed right now, return seconds until the next one."""
+        next_ready = 1.0
+        for key in list(self._pending):
+            edit = self._pending[key]
+            chat = self._chat_bucket(edit.chat_id)
+            chat_wait = chat.wait_time()
+            if chat_wait > 0:
+                if key not in self._deferred:
+                    self._deferred.add(key)
+                    self.stats.deferred += 1
+                next_ready = min(next_ready, chat_wait)
+                continue
+            global_wait = self._global.wait_time()
+            if global_wait > 0:
+                return min(next_ready, global_wait)
+            chat.try_acquire()
+            self._global.try_acquire()
+            del self._pending[key]
+            self._deferred.discard(key)
+            self._sending[key] = edit
+            task = asyncio.create_task(self._send(key, edit))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+        return next_ready
+
+    async def _send(self, key: Hashable, edit: PendingEdit) -> None:
+        try:
+            await self.bot.edit_message_text(
+                chat_id=edit.chat_id,
+                message_id=edit.message_id,
+                text=edit.text,
+                reply_markup=edit.reply_markup,
+            )
+            self.stats.sent += 1
+        except TelegramRetryAfter as exc:
+            self.stats.retry_after += 1
+            self._chat_bucket(edit.chat_id).block_for(exc.retry_after)
+            # возвращаем в очередь, только если ключ не сбросили и не пришёл более свежий текст
+            if self._sending.get(key) is edit:
+                self._pending.setdefault(key, edit)
+                self._wakeup.set()
+        except TelegramBadRequest as exc:
+            if 'message is not modified' not in str(exc):
+                self.stats.failed += 1
+                logger.error('edit_message_text error key=%s: %s', key, exc)
+        except Exception as exc:
+            self.stats.failed += 1
+            logger.error('edit_message_text error key=%s: %s', key, exc)
+        finally:
+            if self._sending.get(key) is edit:
+                del self._sending[key]
+
+    async def _acquire(self, chat_id: int) -> None:
+        while True:
+            chat = self._chat_bucket(chat_id)
+            delay = max(chat.wait_time(), self._global.wait_time())
+            if delay <= 0:
+                chat.try_acquire()
+                self._global.try_acquire()
+                return
+            await asyncio.sleep(delay)
+
+    async def send_message(
+        self,
+        chat_id: int,
+        text: str,
+        reply_markup: Optional[InlineKeyboardMarkup] = None,
+    ) -> None:
+        """Send a new message within the per-chat and global limits, retrying once after RetryAfter."""
+        await self._acquire(chat_id)
+        try:
+            await self.bot.send_message(chat_id, text, reply_markup=reply_markup)
+        except TelegramRetryAfter as exc:
+            self.stats.retry_after += 1
+            self._chat_bucket(chat_id).block_for(exc.retry_after)
+            await self._acquire(chat_id)
+            await self.bot.send_message(chat_id, text, reply_markup=reply_markup)
+        self.stats.messages += 1
+
+    async def run(self) -> None:
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            delay = self._dispatch()
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def report(self) -> str:
+        line = f'{self.stats.as_log()} pending={len(self._pending)}'
+        self.stats = EditStats()
+        return line
@@ -5,10 +5,13 @@ from aiogram.types import CallbackQuery
 
 from app.bot.callbacks.ai import AiActionCallback
 from app.bot.keyboards.ai import ai_menu_keyboard
-from app.core.config import Settings
+from app.bot.progressive_edit import edit_progressively
+from app.core.job_queue import RedisJobQueue
 from app.core.logger import get_logger
 from app.db.models.user import User
-from app.services.ai_service import generate_daily_summary, generate_weekly_report
+from app.services.ai_jobs import AI_JOB_DAILY_SUMMARY, AI_JOB_WEEKLY_REPORT, enqueue_on_demand
+from app.services.ai_service import build_daily_summary_prompt, build_weekly_report_prompt
+from app.services.yandex_gpt import CompletionError, YandexGPTClient
 
 
 logger = get_logger('ai_handlers')
@@ -17,20 +20,41 @@ ai_router = Router()
 
 
 @ai_router.callback_query(AiActionCallback.filter())
-async def ai_menu(callback: CallbackQuery, callback_data: AiActionCallback, user: User, settings: Settings) -> None:
+async def ai_menu(
+    callback: CallbackQuery,
+    callback_data: AiActionCallback,
+    user: User,
+    gpt: YandexGPTClient,
+    ai_queue: RedisJobQueue,
+) -> None:
+    # отвечаем сразу, чтобы у кнопки не крутился индикатор, пока идёт генерация
+    await callback.answer()
     if callback_data.action == 'daily':
         logger.info('ai_daily user_id=%s', user.id)
-        text = await generate_daily_summary(user.id, date.today(), settings)
-        if not text:
-            text = 'Пока не получилось собрать саммари.'
+        kind, day = AI_JOB_DAILY_SUMMARY, date.today()
+        prompt = await build_daily_summary_prompt(user.id, day)
     elif callback_data.action == 'weekly':
         logger.info('ai_weekly user_id=%s', user.id)
         today = date.today()
-        start = today - timedelta(days=today.weekday())
-        text = await generate_weekly_report(user.id, start, settings)
-        if not text:
-            text = 'Пока не получилось собрать отчёт.'
+        kind, day = AI_JOB_WEEKLY_REPORT, today - timedelta(days=today.weekday())
+        prompt = await build_weekly_report_prompt(user.id, day)
     else:
-        text = 'Неизвестное действие.'
-    await callback.message.edit_text(text, reply_markup=ai_menu_keyboard())
-    await callback.answer()
+        await callback.message.edit_text('Неизвестное действие.', reply_markup=ai_menu_keyboard())
+        return
+    if not prompt:
+        await callback.message.edit_text('Пока нечего анализировать.', reply_markup=ai_menu_keyboard())
+        return
+    try:
+        text = await edit_progressively(callback.message, gpt.stream(prompt), reply_markup=ai_menu_keyboard())
+    except CompletionError as exc:
+        # поток оборвался — показанный кусок не ответ, его заменит ответ из очереди
+        logger.warning('ai stream failed user_id=%s: %s', user.id, exc)
+        text = None
+    if text:
+        return
+    # сразу не вышло — ответ соберёт очередь ИИ с повторами и подставит в это же сообщение
+    await enqueue_on_demand(ai_queue, kind, user.id, day, callback.message.chat.id, callback.message.message_id)
+    await callback.message.edit_text(
+        '⏳ ИИ сейчас не отвечает, пришлю ответ в это сообщение, как только он будет готов.',
+        reply_markup=ai_menu_keyboard(),
+    )
@@ -7,7 +7,7 @@ from app.bot.callbacks.stats import StatsActionCallback
 from app.bot.keyboards.stats import stats_menu_keyboard
 from app.core.logger import get_logger
 from app.db.models.user import User
-from app.services.stats_service import get_daily_stats, get_weekly_stats
+from app.services.stats_service import get_daily_stats, get_weekly_totals
 
 
 logger = get_logger('stats_handlers')
@@ -47,12 +47,12 @@ async def show_daily_stats(callback: CallbackQuery, user: User) -> None:
 async def show_weekly_stats(callback: CallbackQuery, user: User) -> None:
     today = date.today()
     start = today - timedelta(days=today.weekday())
-    weekly = await get_weekly_stats(user, start)
+    weekly = await get_weekly_totals(user, start)
     logger.info('show_weekly_stats user_id=%s', user.id)
     lines = [f'📈 Неделя {weekly.start.isoformat()} - {weekly.end.isoformat()}']
     for day, stats in weekly.by_day.items():
         lines.append(
-            f'{day.isoformat()}: задач {len(stats.tasks)}, план {stats.planned_seconds // 60} мин, факт {stats.spent_seconds // 60} мин',
+            f'{day.isoformat()}: задач {stats.total_tasks}, план {stats.planned_seconds // 60} мин, факт {stats.spent_seconds // 60} мин',
         )
     await callback.message.edit_text('\n'.join(lines), reply_markup=stats_menu_keyboard())
     await callback.answer()
@@ -20,7 +20,7 @@ from app.db.models.task import Task, TaskStatus
 from app.db.models.user import User
 from app.services.ai_service import generate_all_done_message
 from app.services.tasks_service import list_tasks_for_date
-from app.services.timers_service import format_seconds, pause_timer, start_timer, stop_timer
+from app.services.timers_service import format_seconds, notify_task_changed, pause_timer, start_timer, stop_timer
 
 
 logger = get_logger('timers_handlers')
@@ -118,6 +118,7 @@ async def timer_add_five(callback: CallbackQuery, callback_data: TimerActionCall
     task.planned_seconds += 5 * 60
     task.status = TaskStatus.ACTIVE
     await task.save()
+    await notify_task_changed(redis, task.id)
     text = (
         f'⏳ Задача: {task.title}\n'
         f'Прошло: {format_seconds(task.spent_seconds)}\n'
@@ -191,6 +192,7 @@ async def extend_task_minutes(message: Message, state: FSMContext, user: User, r
     task.planned_seconds += minutes * 60
     task.status = TaskStatus.ACTIVE
     await task.save()
+    await notify_task_changed(redis, task.id)
     await state.clear()
     text_out = (
         f'⏳ Задача: {task.title}\n'
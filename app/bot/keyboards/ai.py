@@ -2,8 +2,10 @@ from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
 from app.bot.callbacks.ai import AiActionCallback
 from app.bot.callbacks.menu import MenuActionCallback
+from app.bot.keyboards.cache import memoized
 
 
+@memoized('ai_menu')
 def ai_menu_keyboard() -> InlineKeyboardMarkup:
     daily = AiActionCallback(action='daily').pack()
     weekly = AiActionCallback(action='weekly').pack()
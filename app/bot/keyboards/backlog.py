@@ -5,10 +5,12 @@ from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
 from app.bot.callbacks.backlog import BacklogActionCallback, BacklogDayCallback
 from app.bot.callbacks.menu import MenuActionCallback
+from app.bot.keyboards.cache import memoized
 from app.db.models.task import Task
 from app.services.timers_service import format_seconds
 
 
+@memoized('backlog_menu')
 def backlog_menu_keyboard() -> InlineKeyboardMarkup:
     open_days = BacklogActionCallback(action='days').pack()
     add_future = BacklogActionCallback(action='add_future').pack()
@@ -0,0 +1,27 @@
+from collections.abc import Callable
+from functools import lru_cache
+from typing import Any, Dict, TypeVar
+
+
+KEYBOARD_CACHE_SIZE = 4096
+
+F = TypeVar('F', bound=Callable[..., Any])
+
+_CACHED: Dict[str, Any] = {}
+
+
+def memoized(kind: str) -> Callable[[F], F]:
+    """LRU-cache a keyboard factory; cached markups are shared, never mutate them."""
+    def decorator(func: F) -> F:
+        cached = lru_cache(maxsize=KEYBOARD_CACHE_SIZE)(func)
+        _CACHED[kind] = cached
+        return cached  # type: ignore[return-value]
+    return decorator
+
+
+def keyboard_cache_stats() -> str:
+    parts = []
+    for kind, cached in sorted(_CACHED.items()):
+        info = cached.cache_info()
+        parts.append(f'{kind} hits={info.hits} misses={info.misses} size={info.currsize}')
+    return '; '.join(parts)
@@ -3,8 +3,10 @@ from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from app.bot.callbacks.backlog import BacklogActionCallback
 from app.bot.callbacks.stats import StatsActionCallback
 from app.bot.callbacks.tasks import TaskActionCallback
+from app.bot.keyboards.cache import memoized
 
 
+@memoized('main_menu')
 def main_menu_keyboard() -> InlineKeyboardMarkup:
     add_task = TaskActionCallback(action='add', task_id=0).pack()
     stats = StatsActionCallback(action='open').pack()
@@ -2,8 +2,10 @@ from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
 from app.bot.callbacks.menu import MenuActionCallback
 from app.bot.callbacks.stats import StatsActionCallback
+from app.bot.keyboards.cache import memoized
 
 
+@memoized('stats_menu')
 def stats_menu_keyboard() -> InlineKeyboardMarkup:
     daily = StatsActionCallback(action='daily').pack()
     weekly = StatsActionCallback(action='weekly').pack()
@@ -1,24 +1,35 @@
-from typing import List
+from typing import Sequence, Tuple, Union
 
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
 from app.bot.callbacks.menu import MenuActionCallback
 from app.bot.callbacks.stats import StatsActionCallback
 from app.bot.callbacks.tasks import TaskActionCallback, TimerActionCallback
+from app.bot.keyboards.cache import memoized
 from app.db.models.task import Task, TaskStatus
+from app.services.tasks_service import PendingTask
 from app.services.timers_service import format_seconds
 
 
-def tasks_list_keyboard(tasks: List[Task]) -> InlineKeyboardMarkup:
+TaskKey = Tuple[int, str, str, int]
+
+
+@memoized('task_button')
+def _task_button(task_id: int, status: str, title: str, planned_seconds: int) -> InlineKeyboardButton:
+    if status == TaskStatus.COMPLETED:
+        action = TimerActionCallback(action='extend', task_id=task_id).pack()
+        text = f'✅ {title} — {format_seconds(planned_seconds)}'
+    else:
+        action = TimerActionCallback(action='start', task_id=task_id).pack()
+        text = f'{title} — {format_seconds(planned_seconds)} [▶️]'
+    return InlineKeyboardButton(text=text, callback_data=action)
+
+
+@memoized('tasks_list')
+def _tasks_list_markup(keys: Tuple[TaskKey, ...]) -> InlineKeyboardMarkup:
     rows: list[list[InlineKeyboardButton]] = []
-    for task in tasks:
-        if task.status == TaskStatus.COMPLETED:
-            action = TimerActionCallback(action='extend', task_id=task.id).pack()
-            text = f'✅ {task.title} — {format_seconds(task.planned_seconds)}'
-        else:
-            action = TimerActionCallback(action='start', task_id=task.id).pack()
-            text = f'{task.title} — {format_seconds(task.planned_seconds)} [▶️]'
-        rows.append([InlineKeyboardButton(text=text, callback_data=action)])
+    for key in keys:
+        rows.append([_task_button(*key)])
     add_task = TaskActionCallback(action='add', task_id=0).pack()
     stats = StatsActionCallback(action='open').pack()
     back_menu = MenuActionCallback(action='main').pack()
@@ -31,6 +42,12 @@ def tasks_list_keyboard(tasks: List[Task]) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
+def tasks_list_keyboard(tasks: Sequence[Union[Task, PendingTask]]) -> InlineKeyboardMarkup:
+    keys = tuple((t.id, t.status, t.title, t.planned_seconds) for t in tasks)
+    return _tasks_list_markup(keys)
+
+
+@memoized('timer_controls')
 def timer_controls_keyboard(task_id: int) -> InlineKeyboardMarkup:
     pause = TimerActionCallback(action='pause', task_id=task_id).pack()
     complete = TimerActionCallback(action='complete', task_id=task_id).pack()
@@ -51,6 +68,7 @@ def timer_controls_keyboard(task_id: int) -> InlineKeyboardMarkup:
     )
 
 
+@memoized('timer_paused')
 def timer_paused_keyboard(task_id: int) -> InlineKeyboardMarkup:
     resume = TimerActionCallback(action='resume', task_id=task_id).pack()
     back_list = TimerActionCallback(
@@ -67,6 +85,7 @@ def timer_paused_keyboard(task_id: int) -> InlineKeyboardMarkup:
     )
 
 
+@memoized('timer_finished')
 def timer_finished_keyboard(task_id: int) -> InlineKeyboardMarkup:
     back_list = TimerActionCallback(
         action='back_to_list', task_id=task_id).pack()
@@ -80,6 +99,7 @@ def timer_finished_keyboard(task_id: int) -> InlineKeyboardMarkup:
     )
 
 
+@memoized('timer_extend')
 def timer_extend_keyboard(task_id: int) -> InlineKeyboardMarkup:
     extend_add = TimerActionCallback(
         action='extend_add', task_id=task_id).pack()
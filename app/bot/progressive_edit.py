@@ -0,0 +1,71 @@
+import asyncio
+import time
+from typing import AsyncIterable, Optional
+
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.types import InlineKeyboardMarkup, Message
+
+from app.core.logger import get_logger
+
+
+logger = get_logger('progressive_edit')
+
+# между промежуточными правками одного сообщения, и сколько их всего может быть
+STREAM_EDIT_INTERVAL_SECONDS = 1.0
+STREAM_MAX_EDITS = 15
+TELEGRAM_TEXT_LIMIT = 4096
+TYPING_MARK = ' ▌'
+
+
+async def _edit(message: Message, text: str, reply_markup: Optional[InlineKeyboardMarkup]) -> None:
+    try:
+        await message.edit_text(text[:TELEGRAM_TEXT_LIMIT], reply_markup=reply_markup)
+    except TelegramBadRequest as exc:
+        # текст не изменился — для промежуточной правки это не ошибка
+        if 'message is not modified' not in str(exc):
+            raise
+
+
+async def edit_progressively(
+    message: Message,
+    chunks: AsyncIterable[str],
+    reply_markup: Optional[InlineKeyboardMarkup] = None,
+    interval_seconds: float = STREAM_EDIT_INTERVAL_SECONDS,
+    max_edits: int = STREAM_MAX_EDITS,
+) -> Optional[str]:
+    """Show a growing text in message, returns the final text.
+
+    Intermediate texts are shown at most once per interval and no more than
+    max_edits in total, the first one as soon as the next chunk confirms more
+    is coming; chunks arriving in between only replace the pending text. The
+    final text always gets its own edit with reply_markup, so a cached answer
+    costs a single edit. RetryAfter on an intermediate edit just postpones the
+    next one.
+    """
+    text: Optional[str] = None
+    edits = 0
+    next_edit_at = 0.0
+    async for chunk in chunks:
+        # предыдущий кусок точно не последний — последний уйдёт финальной правкой
+        previous, text = text, chunk
+        now = time.monotonic()
+        if previous is None or edits >= max_edits - 1 or now < next_edit_at:
+            continue
+        try:
+            await _edit(message, previous + TYPING_MARK, None)
+        except TelegramRetryAfter as exc:
+            next_edit_at = now + exc.retry_after
+            continue
+        except TelegramBadRequest as exc:
+            logger.warning('intermediate edit failed: %s', exc)
+            continue
+        edits += 1
+        next_edit_at = now + interval_seconds
+    if text is None:
+        return None
+    try:
+        await _edit(message, text, reply_markup)
+    except TelegramRetryAfter as exc:
+        await asyncio.sleep(exc.retry_after)
+        await _edit(message, text, reply_markup)
+    return text
@@ -0,0 +1,117 @@
+from collections.abc import AsyncIterable, Awaitable, Callable, Iterable
+from dataclasses import dataclass
+import asyncio
+import time
+from typing import TypeVar, Union
+
+from app.core.logger import get_logger
+
+
+logger = get_logger('broadcast')
+
+T = TypeVar('T')
+
+PROGRESS_LOG_SECONDS = 30
+
+# True — сообщение отправлено, False — получателю нечего слать
+BroadcastHandler = Callable[[T], Awaitable[bool]]
+
+
+@dataclass
+class BroadcastReport:
+    name: str
+    processed: int = 0
+    sent: int = 0
+    skipped: int = 0
+    failed: int = 0
+    started_at: float = 0.0
+    finished_at: float = 0.0
+
+    @property
+    def seconds(self) -> float:
+        end = self.finished_at or time.monotonic()
+        return max(end - self.started_at, 1e-9)
+
+    @property
+    def per_second(self) -> float:
+        return self.processed / self.seconds
+
+    def as_log(self) -> str:
+        return (
+            f'{self.name}: processed={self.processed} sent={self.sent} skipped={self.skipped} '
+            f'failed={self.failed} seconds={self.seconds:.1f} rate={self.per_second:.1f}/s'
+        )
+
+
+class _Progress:
+    def __init__(self, report: BroadcastReport) -> None:
+        self.report = report
+        self._logged_at = time.monotonic()
+
+    def maybe_log(self) -> None:
+        now = time.monotonic()
+        if now - self._logged_at >= PROGRESS_LOG_SECONDS:
+            self._logged_at = now
+            logger.info('progress %s', self.report.as_log())
+
+
+async def _iterate(items: Union[Iterable[T], AsyncIterable[T]]) -> AsyncIterable[T]:
+    if isinstance(items, AsyncIterable):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+async def broadcast(
+    name: str,
+    items: Union[Iterable[T], AsyncIterable[T]],
+    handler: BroadcastHandler[T],
+    concurrency: int,
+) -> BroadcastReport:
+    """Run handler for every item with at most `concurrency` in flight.
+
+    A failing item is logged and counted, it never stops the others. Items are
+    pulled lazily, so an async generator of users is consumed as it goes.
+    """
+    report = BroadcastReport(name=name, started_at=time.monotonic())
+    progress = _Progress(report)
+    workers = max(concurrency, 1)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+    done = object()
+
+    async def produce() -> None:
+        try:
+            async for item in _iterate(items):
+                await queue.put(item)
+        finally:
+            for _ in range(workers):
+                await queue.put(done)
+
+    async def consume() -> None:
+        while True:
+            item = await queue.get()
+            if item is done:
+                return
+            try:
+                if await handler(item):
+                    report.sent += 1
+                else:
+                    report.skipped += 1
+            except Exception as exc:
+                report.failed += 1
+                logger.error('%s item error %r: %s', name, item, exc)
+            report.processed += 1
+            progress.maybe_log()
+
+    consumers = [asyncio.create_task(consume()) for _ in range(workers)]
+    try:
+        await produce()
+        await asyncio.gather(*consumers)
+    finally:
+        for consumer in consumers:
+            consumer.cancel()
+    report.finished_at = time.monotonic()
+    logger.info('done %s', report.as_log())
+    return report
@@ -0,0 +1,50 @@
+from collections import OrderedDict
+from typing import Generic, Hashable, Optional, TypeVar
+
+
+V = TypeVar('V')
+
+
+class BoundedCache(Generic[V]):
+    """Small in-process LRU with hit/miss counters.
+
+    `generation` grows on every pop/clear. A caller that loads a value from
+    the database takes the generation before the read and passes it to
+    `put`: if something was evicted meanwhile, the value may predate the
+    change and is not cached.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self._items: 'OrderedDict[Hashable, V]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: Hashable) -> Optional[V]:
+        value = self._items.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: V, generation: Optional[int] = None) -> None:
+        if generation is not None and generation != self.generation:
+            return
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        self.generation += 1
+        self._items.pop(key, None)
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._items.clear()
@@ -0,0 +1,96 @@
+import asyncio
+from collections import deque
+import time
+from typing import Deque
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# как часто ждущие потребители проверяют, чем закончилась пробная попытка
+PROBE_POLL_SECONDS = 0.5
+
+
+class CircuitBreaker:
+    """Error-rate circuit breaker over the last `window` calls.
+
+    Opens when at least min_calls were made and the share of failures among
+    them reaches failure_ratio. After open_seconds one probe call is let
+    through (half-open): its success closes the breaker, its failure opens it
+    again for another open_seconds.
+    """
+
+    def __init__(self, failure_ratio: float, window: int, min_calls: int, open_seconds: float) -> None:
+        self.failure_ratio = failure_ratio
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.opened = 0
+        self._state = CLOSED
+        self._open_until = 0.0
+        self._probing = False
+        # True — успешный вызов, False — ошибка
+        self._outcomes: Deque[bool] = deque(maxlen=max(window, 1))
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() >= self._open_until:
+            return HALF_OPEN
+        return self._state
+
+    async def acquire(self) -> None:
+        """Wait until a call may go: the breaker is closed or this is the probe."""
+        while True:
+            now = time.monotonic()
+            if self._state == CLOSED:
+                return
+            if self._state == OPEN and now >= self._open_until:
+                self._state = HALF_OPEN
+                self._probing = False
+            if self._state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            delay = self._open_until - now if self._state == OPEN else PROBE_POLL_SECONDS
+            await asyncio.sleep(max(delay, PROBE_POLL_SECONDS))
+
+    def cancel(self) -> None:
+        """Give back a permit that was not used for a call."""
+        if self._state == HALF_OPEN:
+            self._probing = False
+
+    def record_success(self) -> None:
+        # вызовы, начатые до размыкания, на решение не влияют
+        if self._state == OPEN:
+            return
+        if self._state == HALF_OPEN:
+            self._close()
+            return
+        self._outcomes.append(True)
+
+    def record_failure(self) -> None:
+        if self._state == OPEN:
+            return
+        if self._state == HALF_OPEN:
+            self._open()
+            return
+        self._outcomes.append(False)
+        if len(self._outcomes) < self.min_calls:
+            return
+        failures = self._outcomes.count(False)
+        if failures / len(self._outcomes) >= self.failure_ratio:
+            self._open()
+
+    def _open(self) -> None:
+        self._state = OPEN
+        self._open_until = time.monotonic() + self.open_seconds
+        self._probing = False
+        self.opened += 1
+
+    def _close(self) -> None:
+        self._state = CLOSED
+        self._probing = False
+        self._outcomes.clear()
+
+    def as_log(self) -> str:
+        failures = self._outcomes.count(False)
+        return f'state={self.state} opened={self.opened} recent_failures={failures}/{len(self._outcomes)}'
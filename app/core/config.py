@@ -1,5 +1,7 @@
 from dataclasses import dataclass
 import os
+import socket
+from typing import Tuple
 
 from dotenv import load_dotenv
 
@@ -27,6 +29,40 @@ class YandexGPTConfig:
     api_key: str
     folder_id: str
     endpoint: str
+    # асинхронный режим: операция ставится в completionAsync, результат забирается из operations
+    async_endpoint: str
+    operations_endpoint: str
+    poll_interval_seconds: float
+    poll_max_rounds: int
+    max_connections: int
+    max_keepalive_connections: int
+    keepalive_seconds: float
+    connect_timeout_seconds: float
+    timeout_seconds: float
+    # нужен пакет h2 (pip install 'httpx[http2]'); без него остаётся HTTP/1.1
+    http2: bool
+    cache_ttl_seconds: int
+    cache_max_entries: int
+    cache_max_bytes: int
+    # сколько запросов одновременно уходит в один адрес API с процесса
+    endpoint_concurrency: int
+
+
+@dataclass
+class AIQueueConfig:
+    consumers: int
+    max_attempts: int
+    backoff_base_seconds: float
+    backoff_max_seconds: float
+    # задача, которую потребитель держит дольше, считается брошенной
+    claim_idle_seconds: float
+    dead_letter_maxlen: int
+    breaker_failure_ratio: float
+    breaker_window: int
+    breaker_min_calls: int
+    breaker_open_seconds: float
+    # типы задач очереди, которые идут через асинхронный API
+    deferred_kinds: Tuple[str, ...]
 
 
 @dataclass
@@ -38,6 +74,36 @@ class CronConfig:
     weekly_weekday: int
     weekly_hour: int
     reminders_interval_hours: int
+    broadcast_concurrency: int
+    worker_id: str
+    leader_ttl_seconds: int
+    catchup_hours: int
+    # через сколько секунд неотправленная заявка в журнале доставок считается брошенной
+    delivery_claim_seconds: float
+    cleanup_batch_size: int
+    cleanup_archive_dir: str
+    # за сколько минут до DAILY_SUMMARY заранее готовить саммари тем, у кого день выглядит законченным; 0 — не готовить
+    precompute_lead_minutes: int
+
+
+@dataclass
+class TimersConfig:
+    worker_id: str
+    lease_ttl_seconds: int
+    refresh_head_seconds: int
+    refresh_tail_seconds: int
+    refresh_step_seconds: int
+    meta_cache_size: int
+    snapshot_seconds: int
+    # сколько таймеров одновременно завершается по дедлайну
+    completion_concurrency: int
+
+
+@dataclass
+class TelegramLimitsConfig:
+    global_rate: float
+    chat_rate: float
+    chat_burst: float
 
 
 @dataclass
@@ -46,8 +112,11 @@ class Settings:
     db: DbConfig
     redis: RedisConfig
     yandex_gpt: YandexGPTConfig
+    ai_queue: AIQueueConfig
     timezone: str
     cron: CronConfig
+    timers: TimersConfig
+    telegram: TelegramLimitsConfig
 
 
 def get_settings() -> Settings:
@@ -67,6 +136,41 @@ def get_settings() -> Settings:
             'YANDEX_GPT_ENDPOINT',
             'https://llm.api.cloud.yandex.net/foundationModels/v1/completion',
         ),
+        async_endpoint=os.getenv(
+            'YANDEX_GPT_ASYNC_ENDPOINT',
+            'https://llm.api.cloud.yandex.net/foundationModels/v1/completionAsync',
+        ),
+        operations_endpoint=os.getenv(
+            'YANDEX_GPT_OPERATIONS_ENDPOINT',
+            'https://operation.api.cloud.yandex.net/operations',
+        ),
+        poll_interval_seconds=float(os.getenv('YANDEX_GPT_POLL_INTERVAL_SECONDS', '10')),
+        poll_max_rounds=int(os.getenv('YANDEX_GPT_POLL_MAX_ROUNDS', '30')),
+        max_connections=int(os.getenv('YANDEX_GPT_MAX_CONNECTIONS', '20')),
+        max_keepalive_connections=int(os.getenv('YANDEX_GPT_MAX_KEEPALIVE', '10')),
+        keepalive_seconds=float(os.getenv('YANDEX_GPT_KEEPALIVE_SECONDS', '60')),
+        connect_timeout_seconds=float(os.getenv('YANDEX_GPT_CONNECT_TIMEOUT', '5')),
+        timeout_seconds=float(os.getenv('YANDEX_GPT_TIMEOUT', '20')),
+        http2=os.getenv('YANDEX_GPT_HTTP2', '0') == '1',
+        cache_ttl_seconds=int(os.getenv('YANDEX_GPT_CACHE_TTL_SECONDS', '86400')),
+        cache_max_entries=int(os.getenv('YANDEX_GPT_CACHE_MAX_ENTRIES', '50000')),
+        cache_max_bytes=int(os.getenv('YANDEX_GPT_CACHE_MAX_BYTES', '16384')),
+        endpoint_concurrency=int(os.getenv('YANDEX_GPT_ENDPOINT_CONCURRENCY', '10')),
+    )
+    ai_queue = AIQueueConfig(
+        consumers=int(os.getenv('AI_QUEUE_CONSUMERS', '8')),
+        max_attempts=int(os.getenv('AI_QUEUE_MAX_ATTEMPTS', '5')),
+        backoff_base_seconds=float(os.getenv('AI_QUEUE_BACKOFF_BASE_SECONDS', '2')),
+        backoff_max_seconds=float(os.getenv('AI_QUEUE_BACKOFF_MAX_SECONDS', '300')),
+        claim_idle_seconds=float(os.getenv('AI_QUEUE_CLAIM_IDLE_SECONDS', '300')),
+        dead_letter_maxlen=int(os.getenv('AI_QUEUE_DEAD_LETTER_MAXLEN', '10000')),
+        breaker_failure_ratio=float(os.getenv('AI_BREAKER_FAILURE_RATIO', '0.5')),
+        breaker_window=int(os.getenv('AI_BREAKER_WINDOW', '20')),
+        breaker_min_calls=int(os.getenv('AI_BREAKER_MIN_CALLS', '10')),
+        breaker_open_seconds=float(os.getenv('AI_BREAKER_OPEN_SECONDS', '30')),
+        deferred_kinds=tuple(
+            kind.strip() for kind in os.getenv('AI_DEFERRED_JOB_KINDS', 'weekly_report').split(',') if kind.strip()
+        ),
     )
     timezone = os.getenv('DEFAULT_TIMEZONE', 'UTC')
     daily_hour = int(os.getenv('DAILY_SUMMARY_HOUR', '23'))
@@ -84,12 +188,38 @@ def get_settings() -> Settings:
         weekly_weekday=weekly_weekday,
         weekly_hour=weekly_hour,
         reminders_interval_hours=reminders_interval_hours,
+        broadcast_concurrency=int(os.getenv('CRON_BROADCAST_CONCURRENCY', '20')),
+        worker_id=os.getenv('CRON_WORKER_ID', f'{socket.gethostname()}:{os.getpid()}'),
+        leader_ttl_seconds=int(os.getenv('CRON_LEADER_TTL_SECONDS', '15')),
+        catchup_hours=int(os.getenv('CRON_CATCHUP_HOURS', '12')),
+        delivery_claim_seconds=float(os.getenv('CRON_DELIVERY_CLAIM_SECONDS', '180')),
+        cleanup_batch_size=int(os.getenv('CLEANUP_BATCH_SIZE', '1000')),
+        cleanup_archive_dir=os.getenv('CLEANUP_ARCHIVE_DIR', ''),
+        precompute_lead_minutes=int(os.getenv('DAILY_PRECOMPUTE_LEAD_MINUTES', '60')),
+    )
+    timers = TimersConfig(
+        worker_id=os.getenv('TIMERS_WORKER_ID', f'{socket.gethostname()}:{os.getpid()}'),
+        lease_ttl_seconds=int(os.getenv('TIMERS_LEASE_TTL_SECONDS', '10')),
+        refresh_head_seconds=int(os.getenv('TIMERS_REFRESH_HEAD_SECONDS', '30')),
+        refresh_tail_seconds=int(os.getenv('TIMERS_REFRESH_TAIL_SECONDS', '60')),
+        refresh_step_seconds=int(os.getenv('TIMERS_REFRESH_STEP_SECONDS', '30')),
+        meta_cache_size=int(os.getenv('TIMERS_META_CACHE_SIZE', '10000')),
+        snapshot_seconds=int(os.getenv('TIMERS_SNAPSHOT_SECONDS', '30')),
+        completion_concurrency=int(os.getenv('TIMERS_COMPLETION_CONCURRENCY', '20')),
+    )
+    telegram = TelegramLimitsConfig(
+        global_rate=float(os.getenv('TELEGRAM_GLOBAL_RATE', '25')),
+        chat_rate=float(os.getenv('TELEGRAM_CHAT_RATE', '1')),
+        chat_burst=float(os.getenv('TELEGRAM_CHAT_BURST', '3')),
     )
     return Settings(
         bot=bot,
         db=db,
         redis=redis,
         yandex_gpt=yandex_gpt,
+        ai_queue=ai_queue,
         timezone=timezone,
         cron=cron,
+        timers=timers,
+        telegram=telegram,
     )
@@ -1,5 +1,16 @@
 APP_NAME = 'ai-tracker'
 
 REDIS_ACTIVE_TIMER_PREFIX = 'active_timer:'
+REDIS_ACTIVE_TIMERS_INDEX = 'active_timers:deadlines'
+REDIS_TIMERS_WORKER_LEASES = 'timers_worker'
+REDIS_TIMER_EVENTS_CHANNEL = 'timers:events'
+REDIS_TASK_CHANGED_CHANNEL = 'tasks:changed'
+REDIS_CRON_LEADER_KEY = 'cron_worker:leader'
+REDIS_AI_CACHE_PREFIX = 'ai_cache:'
+REDIS_AI_CACHE_INDEX = 'ai_cache_index'
+REDIS_AI_JOBS_QUEUE = 'ai_jobs'
+
+# таймеры шардируются по task_id % TIMER_PARTITIONS, менять только вместе с перезапуском всех воркеров
+TIMER_PARTITIONS = 16
 
 
@@ -0,0 +1,91 @@
+from collections.abc import Awaitable, Callable
+import asyncio
+import heapq
+import time
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+
+
+DeadlineCallback = Callable[[Hashable], Awaitable[None]]
+
+
+class DeadlineQueue:
+    """Min-heap of deadlines (unix timestamps) with lazy cancellation.
+
+    `run` sleeps exactly until the earliest deadline and wakes up early when
+    an earlier one is scheduled, so the cost does not depend on how many
+    deadlines are pending. Due callbacks run concurrently, so a slow one does
+    not hold back the others.
+    """
+
+    def __init__(self) -> None:
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._deadlines: Dict[Hashable, float] = {}
+        self._counter = 0
+        self._changed = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._deadlines
+
+    def schedule(self, key: Hashable, deadline: float) -> None:
+        if self._deadlines.get(key) == deadline:
+            return
+        earliest = self.next_deadline()
+        self._deadlines[key] = deadline
+        self._counter += 1
+        heapq.heappush(self._heap, (deadline, self._counter, key))
+        if earliest is None or deadline < earliest:
+            self._changed.set()
+
+    def cancel(self, key: Hashable) -> None:
+        self._deadlines.pop(key, None)
+
+    def clear(self) -> None:
+        self._heap.clear()
+        self._deadlines.clear()
+
+    def next_deadline(self) -> Optional[float]:
+        while self._heap:
+            deadline, _, key = self._heap[0]
+            if self._deadlines.get(key) == deadline:
+                return deadline
+            heapq.heappop(self._heap)
+        return None
+
+    def pop_due(self, now: float) -> List[Hashable]:
+        due: List[Hashable] = []
+        while True:
+            deadline = self.next_deadline()
+            if deadline is None or deadline > now:
+                return due
+            _, _, key = heapq.heappop(self._heap)
+            del self._deadlines[key]
+            due.append(key)
+
+    async def _call(self, callback: DeadlineCallback, key: Hashable, slots: asyncio.Semaphore) -> None:
+        try:
+            await callback(key)
+        finally:
+            slots.release()
+
+    async def run(self, callback: DeadlineCallback, concurrency: int) -> None:
+        """Call `callback` for every due key, at most `concurrency` at a time."""
+        slots = asyncio.Semaphore(max(concurrency, 1))
+        running: Set[asyncio.Task] = set()
+        while True:
+            deadline = self.next_deadline()
+            timeout = None if deadline is None else max(deadline - time.time(), 0)
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=timeout)
+                continue
+            except asyncio.TimeoutError:
+                pass
+            for key in self.pop_due(time.time()):
+                # все слоты заняты — ждём здесь, новые дедлайны пока копятся в куче
+                await slots.acquire()
+                task = asyncio.create_task(self._call(callback, key, slots))
+                running.add(task)
+                task.add_done_callback(running.discard)
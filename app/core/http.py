@@ -0,0 +1,79 @@
+from dataclasses import dataclass
+import importlib.util
+from typing import Any, Dict
+
+import httpx
+
+from app.core.logger import get_logger
+
+
+logger = get_logger('http')
+
+
+def http2_available() -> bool:
+    return importlib.util.find_spec('h2') is not None
+
+
+@dataclass
+class HttpStats:
+    requests: int = 0
+    failures: int = 0
+    # запросы, которым пришлось открыть новое соединение, и те, что ушли по уже открытому
+    new_connections: int = 0
+    reused: int = 0
+    seconds: float = 0.0
+
+    def as_log(self) -> str:
+        avg = self.seconds / self.requests if self.requests else 0.0
+        return (
+            f'requests={self.requests} failures={self.failures} new_connections={self.new_connections} '
+            f'reused={self.reused} avg={avg:.2f}s'
+        )
+
+
+class RequestTrace:
+    """httpcore trace hook for one request: did it open a TCP connection or reuse a pooled one."""
+
+    def __init__(self) -> None:
+        self.connected = False
+        self.sent = False
+
+    async def __call__(self, event: str, info: Dict[str, Any]) -> None:
+        if event == 'connection.connect_tcp.complete':
+            self.connected = True
+        elif event.endswith('.send_request_headers.complete'):
+            self.sent = True
+
+    @property
+    def extensions(self) -> Dict[str, Any]:
+        return {'trace': self}
+
+    def record(self, stats: HttpStats) -> None:
+        if self.connected:
+            stats.new_connections += 1
+        elif self.sent:
+            stats.reused += 1
+
+
+def create_http_client(
+    *,
+    max_connections: int,
+    max_keepalive_connections: int,
+    keepalive_seconds: float,
+    connect_timeout_seconds: float,
+    timeout_seconds: float,
+    http2: bool,
+) -> httpx.AsyncClient:
+    """Long-lived pooled client; the caller owns it and must close it with aclose()."""
+    if http2 and not http2_available():
+        logger.warning('HTTP/2 requested, but the h2 package is not installed: using HTTP/1.1')
+        http2 = False
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_seconds,
+        ),
+        timeout=httpx.Timeout(timeout_seconds, connect=connect_timeout_seconds),
+    )
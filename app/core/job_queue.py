@@ -0,0 +1,323 @@
+"""Durable job queue on a Redis stream with retries and dead letters.
+
+Jobs are stream entries read through a consumer group, so any number of
+consumers in any number of processes share the work. A failed job is
+acknowledged and parked in a sorted set until its backoff expires, then put
+back into the stream; after max_attempts (or a PermanentJobError) it goes to
+the dead letter stream. Entries left pending by a crashed consumer are
+claimed after claim_idle_seconds and count as a failed attempt.
+
+A handler may update job.payload before raising: the retry, or the later run
+asked for with RescheduleJob, gets the payload as the handler left it.
+"""
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+import asyncio
+import json
+import random
+import time
+from typing import Any, Dict, Optional
+import uuid
+
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+
+from app.core.circuit_breaker import CircuitBreaker
+from app.core.logger import get_logger
+
+
+logger = get_logger('job_queue')
+
+READ_BLOCK_MS = 5000
+MAINTENANCE_SECONDS = 1.0
+PROMOTE_BATCH_SIZE = 100
+
+_PROMOTE_SCRIPT = """
+local due = redis.call('zrangebyscore', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, member in ipairs(due) do
+    redis.call('zrem', KEYS[1], member)
+    redis.call('xadd', KEYS[2], '*', 'job', member)
+end
+return #due
+"""
+
+
+class PermanentJobError(Exception):
+    """Retrying cannot help; the job goes to dead letters right away."""
+
+
+class RescheduleJob(Exception):
+    """Not a failure: run the job again after delay_seconds, e.g. to poll a long operation."""
+
+    def __init__(self, delay_seconds: float) -> None:
+        super().__init__(f'rescheduled in {delay_seconds:.0f}s')
+        self.delay_seconds = delay_seconds
+
+
+@dataclass
+class QueueJob:
+    kind: str
+    payload: Dict[str, Any]
+    attempt: int = 0
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    # id записи в стриме, у отложенной задачи его нет
+    entry_id: str = ''
+
+    def encode(self) -> str:
+        return json.dumps(
+            {'id': self.id, 'kind': self.kind, 'payload': self.payload, 'attempt': self.attempt},
+            ensure_ascii=False,
+            separators=(',', ':'),
+        )
+
+    @classmethod
+    def decode(cls, entry_id: str, raw: str) -> 'QueueJob':
+        data = json.loads(raw)
+        return cls(
+            kind=data['kind'],
+            payload=data['payload'],
+            attempt=int(data.get('attempt', 0)),
+            id=data['id'],
+            entry_id=entry_id,
+        )
+
+
+JobHandler = Callable[[QueueJob], Awaitable[None]]
+
+
+def backoff_delay(attempt: int, base_seconds: float, max_seconds: float) -> float:
+    """Exponential backoff with full jitter: uniform in [0, min(max, base * 2**attempt)]."""
+    return random.uniform(0, min(max_seconds, base_seconds * 2 ** attempt))
+
+
+@dataclass
+class QueueStats:
+    enqueued: int = 0
+    done: int = 0
+    retried: int = 0
+    dead: int = 0
+    reclaimed: int = 0
+    rescheduled: int = 0
+
+    def as_log(self) -> str:
+        return (
+            f'enqueued={self.enqueued} done={self.done} retried={self.retried} '
+            f'dead={self.dead} reclaimed={self.reclaimed} rescheduled={self.rescheduled}'
+        )
+
+
+class RedisJobQueue:
+    def __init__(
+        self,
+        redis: Redis,
+        name: str,
+        *,
+        consumer: str,
+        max_attempts: int,
+        backoff_base_seconds: float,
+        backoff_max_seconds: float,
+        claim_idle_seconds: float,
+        dead_letter_maxlen: int,
+    ) -> None:
+        self.redis = redis
+        self.name = name
+        self.consumer = consumer
+        self.max_attempts = max_attempts
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.claim_idle_ms = int(claim_idle_seconds * 1000)
+        self.dead_letter_maxlen = dead_letter_maxlen
+        self.stats = QueueStats()
+        self._promote = redis.register_script(_PROMOTE_SCRIPT)
+
+    @property
+    def stream_key(self) -> str:
+        return f'{self.name}:stream'
+
+    @property
+    def delayed_key(self) -> str:
+        return f'{self.name}:delayed'
+
+    @property
+    def dead_key(self) -> str:
+        return f'{self.name}:dead'
+
+    @property
+    def group(self) -> str:
+        return f'{self.name}:workers'
+
+    def is_last_attempt(self, job: QueueJob) -> bool:
+        return job.attempt + 1 >= self.max_attempts
+
+    async def enqueue(self, kind: str, payload: Dict[str, Any]) -> QueueJob:
+        job = QueueJob(kind=kind, payload=payload)
+        job.entry_id = await self.redis.xadd(self.stream_key, {'job': job.encode()})
+        self.stats.enqueued += 1
+        return job
+
+    async def ensure_group(self) -> None:
+        try:
+            await self.redis.xgroup_create(self.stream_key, self.group, id='0', mkstream=True)
+        except ResponseError as exc:
+            if 'BUSYGROUP' not in str(exc):
+                raise
+
+    def _ack(self, pipe: Any, job: QueueJob) -> None:
+        pipe.xack(self.stream_key, self.group, job.entry_id)
+        pipe.xdel(self.stream_key, job.entry_id)
+
+    async def _complete(self, job: QueueJob) -> None:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            self._ack(pipe, job)
+            await pipe.execute()
+        self.stats.done += 1
+
+    async def _reschedule(self, job: QueueJob, delay_seconds: float) -> None:
+        later = QueueJob(kind=job.kind, payload=job.payload, attempt=job.attempt, id=job.id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            self._ack(pipe, job)
+            pipe.zadd(self.delayed_key, {later.encode(): time.time() + delay_seconds})
+            await pipe.execute()
+        self.stats.rescheduled += 1
+
+    async def _fail(self, job: QueueJob, error: str, permanent: bool = False) -> None:
+        """Park the job for a retry after backoff, or bury it when out of attempts."""
+        retry = QueueJob(kind=job.kind, payload=job.payload, attempt=job.attempt + 1, id=job.id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            self._ack(pipe, job)
+            if permanent or retry.attempt >= self.max_attempts:
+                pipe.xadd(
+                    self.dead_key,
+                    {
+                        'job': retry.encode(),
+                        'error': error[:1000],
+                        'failed_at': datetime.now(timezone.utc).isoformat(),
+                    },
+                    maxlen=self.dead_letter_maxlen,
+                    approximate=True,
+                )
+                buried = True
+            else:
+                delay = backoff_delay(job.attempt, self.backoff_base_seconds, self.backoff_max_seconds)
+                pipe.zadd(self.delayed_key, {retry.encode(): time.time() + delay})
+                buried = False
+            await pipe.execute()
+        if buried:
+            self.stats.dead += 1
+            logger.error('%s job %s %s dead after %s attempts: %s', self.name, job.kind, job.id, retry.attempt, error)
+        else:
+            self.stats.retried += 1
+            logger.warning('%s job %s %s attempt %s failed: %s', self.name, job.kind, job.id, retry.attempt, error)
+
+    async def _read(self, consumer: str) -> Optional[QueueJob]:
+        response = await self.redis.xreadgroup(
+            self.group,
+            consumer,
+            {self.stream_key: '>'},
+            count=1,
+            block=READ_BLOCK_MS,
+        )
+        for _, entries in response or []:
+            for entry_id, fields in entries:
+                return QueueJob.decode(entry_id, fields['job'])
+        return None
+
+    async def _process(self, job: QueueJob, handler: JobHandler, breaker: CircuitBreaker) -> None:
+        try:
+            await handler(job)
+        except RescheduleJob as exc:
+            breaker.record_success()
+            await self._reschedule(job, exc.delay_seconds)
+            return
+        except PermanentJobError as exc:
+            # ответ от сервиса был — для предохранителя это не сбой
+            breaker.record_success()
+            await self._fail(job, str(exc), permanent=True)
+            return
+        except Exception as exc:
+            breaker.record_failure()
+            await self._fail(job, f'{type(exc).__name__}: {exc}')
+            return
+        breaker.record_success()
+        await self._complete(job)
+
+    async def _consume(self, consumer: str, handler: JobHandler, breaker: CircuitBreaker) -> None:
+        while True:
+            # пока предохранитель разомкнут, новые задачи не забираем — они ждут в стриме
+            await breaker.acquire()
+            try:
+                job = await self._read(consumer)
+            except Exception as exc:
+                breaker.cancel()
+                logger.error('%s read error: %s', self.name, exc)
+                await asyncio.sleep(1)
+                continue
+            if job is None:
+                breaker.cancel()
+                continue
+            try:
+                await self._process(job, handler, breaker)
+            except Exception as exc:
+                # не смогли ни подтвердить, ни отложить — запись останется висеть и её заберёт _reclaim
+                logger.error('%s job %s bookkeeping error: %s', self.name, job.id, exc)
+
+    async def _promote_due(self) -> int:
+        return int(await self._promote(
+            keys=[self.delayed_key, self.stream_key],
+            args=[time.time(), PROMOTE_BATCH_SIZE],
+        ))
+
+    async def _reclaim(self) -> None:
+        """Entries idle in a dead consumer count as a failed attempt of that job."""
+        _, entries, *_ = await self.redis.xautoclaim(
+            self.stream_key,
+            self.group,
+            self.consumer,
+            min_idle_time=self.claim_idle_ms,
+            count=PROMOTE_BATCH_SIZE,
+        )
+        for entry_id, fields in entries:
+            if not fields:
+                # запись удалили, а в списке ожидающих она осталась
+                await self.redis.xack(self.stream_key, self.group, entry_id)
+                continue
+            self.stats.reclaimed += 1
+            await self._fail(QueueJob.decode(entry_id, fields['job']), 'consumer did not finish the job in time')
+
+    async def _maintain(self) -> None:
+        while True:
+            try:
+                while await self._promote_due() >= PROMOTE_BATCH_SIZE:
+                    pass
+                await self._reclaim()
+            except Exception as exc:
+                logger.error('%s maintenance error: %s', self.name, exc)
+            await asyncio.sleep(MAINTENANCE_SECONDS)
+
+    async def run(self, handler: JobHandler, consumers: int, breaker: CircuitBreaker) -> None:
+        """Consume jobs with `consumers` concurrent workers until cancelled."""
+        await self.ensure_group()
+        tasks = [asyncio.create_task(self._maintain())]
+        tasks += [
+            asyncio.create_task(self._consume(f'{self.consumer}:{i}', handler, breaker))
+            for i in range(max(consumers, 1))
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def counts(self) -> Dict[str, int]:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.xlen(self.stream_key)
+            pipe.zcard(self.delayed_key)
+            pipe.xlen(self.dead_key)
+            queued, delayed, dead = await pipe.execute()
+        return {'queued': queued, 'delayed': delayed, 'dead': dead}
+
+    async def report(self) -> str:
+        counts = await self.counts()
+        return f'{self.stats.as_log()} ' + ' '.join(f'{k}={v}' for k, v in counts.items())
@@ -0,0 +1,112 @@
+import math
+import time
+from typing import List, Set
+
+from redis.asyncio import Redis
+
+
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisLease:
+    """Renewable exclusive lease on a single Redis key."""
+
+    def __init__(self, redis: Redis, key: str, owner: str, ttl_seconds: float) -> None:
+        self.redis = redis
+        self.key = key
+        self.owner = owner
+        self.ttl_ms = int(ttl_seconds * 1000)
+        self._renew = redis.register_script(_RENEW_SCRIPT)
+        self._release = redis.register_script(_RELEASE_SCRIPT)
+
+    async def acquire(self) -> bool:
+        return bool(await self.redis.set(self.key, self.owner, nx=True, px=self.ttl_ms))
+
+    async def renew(self) -> bool:
+        return bool(await self._renew(keys=[self.key], args=[self.owner, self.ttl_ms]))
+
+    async def release(self) -> None:
+        await self._release(keys=[self.key], args=[self.owner])
+
+    async def acquire_or_renew(self) -> bool:
+        if await self.renew():
+            return True
+        return await self.acquire()
+
+
+class PartitionLeases:
+    """Fair split of a fixed set of partitions between live replicas.
+
+    Every replica heartbeats into a shared members set, renews the leases it
+    holds, gives away partitions above its fair share and picks up free ones
+    below it. Leases of a dead replica expire after ttl and are claimed by the
+    survivors on their next heartbeat.
+    """
+
+    def __init__(self, redis: Redis, name: str, partitions: int, owner: str, ttl_seconds: float) -> None:
+        self.redis = redis
+        self.name = name
+        self.partitions = partitions
+        self.owner = owner
+        self.ttl_seconds = ttl_seconds
+        self.owned: Set[int] = set()
+        self._leases = [
+            RedisLease(redis, f'{name}:lease:{p}', owner, ttl_seconds)
+            for p in range(partitions)
+        ]
+
+    @property
+    def members_key(self) -> str:
+        return f'{self.name}:members'
+
+    async def _live_members(self) -> List[str]:
+        now = time.time()
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zadd(self.members_key, {self.owner: now})
+            pipe.zremrangebyscore(self.members_key, '-inf', now - self.ttl_seconds)
+            pipe.zrange(self.members_key, 0, -1)
+            _, _, members = await pipe.execute()
+        return sorted(members)
+
+    async def heartbeat(self) -> Set[int]:
+        members = await self._live_members()
+        fair_share = math.ceil(self.partitions / max(len(members), 1))
+        for p in sorted(self.owned):
+            if not await self._leases[p].renew():
+                self.owned.discard(p)
+        for p in sorted(self.owned, reverse=True):
+            if len(self.owned) <= fair_share:
+                break
+            await self._leases[p].release()
+            self.owned.discard(p)
+        if len(self.owned) < fair_share:
+            # начинаем со своей «доли», чтобы реплики не толкались за одни и те же партиции
+            rank = members.index(self.owner) if self.owner in members else 0
+            start = rank * fair_share
+            for i in range(self.partitions):
+                if len(self.owned) >= fair_share:
+                    break
+                p = (start + i) % self.partitions
+                if p in self.owned:
+                    continue
+                if await self._leases[p].acquire():
+                    self.owned.add(p)
+        return set(self.owned)
+
+    async def release_all(self) -> None:
+        for p in sorted(self.owned):
+            await self._leases[p].release()
+        self.owned.clear()
+        await self.redis.zrem(self.members_key, self.owner)
@@ -1,23 +1,343 @@
+"""Async job scheduler with cron and interval triggers.
+
+Jobs sit in a min-heap ordered by their next fire time and the loop sleeps
+exactly until the earliest one. A job never overlaps itself: the next run is
+planned only after the current one finishes, occurrences missed meanwhile go
+through the misfire policy (coalesce into one run or replay each of them, drop
+those later than misfire_grace_seconds).
+"""
 from collections.abc import Awaitable, Callable
 from dataclasses import dataclass
+from datetime import date, datetime, time as dt_time, timedelta, timezone
 import asyncio
+import heapq
+import random
+import time
+from typing import Dict, FrozenSet, Iterable, List, Optional, Protocol, Set, Tuple
+
+from app.core.logger import get_logger
+from app.core.timezones import get_zone
+
+
+logger = get_logger('scheduler')
+
+# func(run_at) — run_at это плановое время запуска без джиттера
+JobFunc = Callable[[datetime], Awaitable[None]]
+
+
+class Trigger(Protocol):
+    def next_run(self, after: datetime) -> Optional[datetime]:
+        """First fire time strictly after `after`, None when there is none."""
+        ...
+
+
+class IntervalTrigger:
+    def __init__(self, seconds: float) -> None:
+        if seconds <= 0:
+            raise ValueError('interval must be positive')
+        self.interval = timedelta(seconds=seconds)
+
+    def next_run(self, after: datetime) -> Optional[datetime]:
+        return after + self.interval
+
+
+def _parse_field(spec: str, low: int, high: int) -> FrozenSet[int]:
+    values: Set[int] = set()
+    for part in spec.split(','):
+        step = 1
+        if '/' in part:
+            part, step_spec = part.split('/', 1)
+            step = int(step_spec)
+            if step <= 0:
+                raise ValueError(f'bad step in {spec!r}')
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start_spec, end_spec = part.split('-', 1)
+            start, end = int(start_spec), int(end_spec)
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if start < low or end > high or start > end:
+            raise ValueError(f'{spec!r} is out of range {low}-{high}')
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+class CronTrigger:
+    """Standard 5-field cron expression evaluated in a timezone.
+
+    Fields are minute, hour, day of month, month and day of week (0 or 7 is
+    Sunday). As in cron, when both day fields are restricted a day matches if
+    either of them does.
+    """
+
+    def __init__(self, expression: str, tz: str = 'UTC') -> None:
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f'cron expression needs 5 fields: {expression!r}')
+        self.expression = expression
+        self.tz = tz
+        self.zone = get_zone(tz)
+        self.minutes = sorted(_parse_field(fields[0], 0, 59))
+        self.hours = sorted(_parse_field(fields[1], 0, 23))
+        self.days = _parse_field(fields[2], 1, 31)
+        self.months = _parse_field(fields[3], 1, 12)
+        self.weekdays = frozenset(d % 7 for d in _parse_field(fields[4], 0, 7))
+        self._any_day = fields[2] == '*'
+        self._any_weekday = fields[4] == '*'
+
+    def _day_matches(self, day: date) -> bool:
+        if day.month not in self.months:
+            return False
+        in_days = day.day in self.days
+        # isoweekday: пн=1 … вс=7, в cron вс=0
+        in_weekdays = day.isoweekday() % 7 in self.weekdays
+        if self._any_day or self._any_weekday:
+            return in_days and in_weekdays
+        return in_days or in_weekdays
+
+    def next_run(self, after: datetime) -> Optional[datetime]:
+        day = after.astimezone(self.zone).date()
+        # четыре года покрывают 29 февраля
+        for _ in range(366 * 4 + 1):
+            if self._day_matches(day):
+                for hour in self.hours:
+                    for minute in self.minutes:
+                        local = datetime.combine(day, dt_time(hour=hour, minute=minute), tzinfo=self.zone)
+                        candidate = local.astimezone(timezone.utc)
+                        if candidate > after:
+                            return candidate
+            day += timedelta(days=1)
+        return None
+
+
+class ZonedCronTrigger:
+    """One cron expression evaluated in several timezones at once.
 
+    Fires at the earliest local occurrence among the zones; `zones_at` tells
+    which zones that fire time belongs to, so zones sharing an offset are
+    handled in one run.
+    """
 
-AsyncJob = Callable[[], Awaitable[None]]
+    def __init__(self, expression: str, zones: Iterable[str]) -> None:
+        self.expression = expression
+        self._triggers: Dict[str, CronTrigger] = {}
+        self.set_zones(zones)
+
+    @property
+    def zones(self) -> List[str]:
+        return sorted(self._triggers)
+
+    def set_zones(self, zones: Iterable[str]) -> None:
+        wanted = set(zones)
+        self._triggers = {
+            zone: self._triggers.get(zone) or CronTrigger(self.expression, zone)
+            for zone in wanted
+        }
+
+    def next_run(self, after: datetime) -> Optional[datetime]:
+        runs = [t.next_run(after) for t in self._triggers.values()]
+        return min((r for r in runs if r is not None), default=None)
+
+    def zones_at(self, run_at: datetime) -> List[str]:
+        just_before = run_at - timedelta(microseconds=1)
+        return sorted(zone for zone, t in self._triggers.items() if t.next_run(just_before) == run_at)
 
 
 @dataclass
-class ScheduledJob:
-    task: asyncio.Task
+class JobStats:
+    runs: int = 0
+    failures: int = 0
+    misfires: int = 0
+    coalesced: int = 0
+    last_duration: float = 0.0
+    max_duration: float = 0.0
+    total_duration: float = 0.0
+
+    @property
+    def avg_duration(self) -> float:
+        finished = self.runs + self.failures
+        return self.total_duration / finished if finished else 0.0
+
+
+class Job:
+    def __init__(
+        self,
+        name: str,
+        trigger: Trigger,
+        func: JobFunc,
+        jitter_seconds: float,
+        misfire_grace_seconds: float,
+        coalesce: bool,
+        cursor: datetime,
+    ) -> None:
+        self.name = name
+        self.trigger = trigger
+        self.func = func
+        self.jitter_seconds = jitter_seconds
+        self.misfire_grace_seconds = misfire_grace_seconds
+        self.coalesce = coalesce
+        # следующий запуск ищется строго после cursor
+        self.cursor = cursor
+        self.next_run_at: Optional[datetime] = None
+        self.fire_at = 0.0
+        self.generation = 0
+        self.running: Optional[asyncio.Task] = None
+        self.stats = JobStats()
+
+
+class Scheduler:
+    def __init__(self) -> None:
+        self._jobs: Dict[str, Job] = {}
+        self._heap: List[Tuple[float, int, int, Job]] = []
+        self._counter = 0
+        self._changed = asyncio.Event()
+
+    @property
+    def jobs(self) -> Dict[str, Job]:
+        return dict(self._jobs)
+
+    def add_job(
+        self,
+        name: str,
+        trigger: Trigger,
+        func: JobFunc,
+        *,
+        jitter_seconds: float = 0.0,
+        misfire_grace_seconds: float = 60.0,
+        coalesce: bool = True,
+        start_after: Optional[datetime] = None,
+    ) -> Job:
+        """Register a job; its first run is the first trigger time after start_after.
+
+        A start_after in the past makes the missed occurrences due right away,
+        which is how callers replay runs lost to a restart.
+        """
+        if name in self._jobs:
+            raise ValueError(f'job {name!r} already exists')
+        job = Job(
+            name,
+            trigger,
+            func,
+            jitter_seconds=jitter_seconds,
+            misfire_grace_seconds=misfire_grace_seconds,
+            coalesce=coalesce,
+            cursor=start_after or datetime.now(timezone.utc),
+        )
+        self._jobs[name] = job
+        self._plan(job)
+        return job
+
+    def remove_job(self, name: str) -> None:
+        """Forget the job; a run in progress is allowed to finish."""
+        self._jobs.pop(name, None)
+
+    def reschedule(self, name: str, after: Optional[datetime] = None) -> None:
+        """Recompute the next run, e.g. after the trigger was changed."""
+        job = self._jobs.get(name)
+        if job is None or job.running is not None:
+            return
+        if after is not None:
+            job.cursor = after
+        self._plan(job)
+
+    def _plan(self, job: Job) -> None:
+        job.generation += 1
+        job.next_run_at = job.trigger.next_run(job.cursor)
+        if job.next_run_at is None:
+            return
+        job.fire_at = job.next_run_at.timestamp() + random.uniform(0, job.jitter_seconds)
+        self._counter += 1
+        heapq.heappush(self._heap, (job.fire_at, self._counter, job.generation, job))
+        self._changed.set()
+
+    def _is_current(self, job: Job, generation: int) -> bool:
+        return self._jobs.get(job.name) is job and job.generation == generation and job.running is None
+
+    def _next_fire_at(self) -> Optional[float]:
+        while self._heap:
+            fire_at, _, generation, job = self._heap[0]
+            if self._is_current(job, generation):
+                return fire_at
+            heapq.heappop(self._heap)
+        return None
+
+    def _pop_due(self, now: float) -> List[Job]:
+        due: List[Job] = []
+        while True:
+            fire_at = self._next_fire_at()
+            if fire_at is None or fire_at > now:
+                return due
+            job = heapq.heappop(self._heap)[3]
+            job.generation += 1
+            due.append(job)
+
+    def _dispatch(self, job: Job, now: float) -> None:
+        run_at = job.next_run_at
+        if run_at is None:
+            return
+        if job.coalesce:
+            following = job.trigger.next_run(run_at)
+            while following is not None and following.timestamp() <= now:
+                job.stats.coalesced += 1
+                run_at = following
+                following = job.trigger.next_run(run_at)
+        job.cursor = run_at
+        lateness = now - max(job.fire_at, run_at.timestamp())
+        if lateness > job.misfire_grace_seconds:
+            job.stats.misfires += 1
+            logger.warning('job %s misfired: run at %s is %.0fs late', job.name, run_at.isoformat(), lateness)
+            self._plan(job)
+            return
+        job.running = asyncio.create_task(self._execute(job, run_at))
 
+    async def _execute(self, job: Job, run_at: datetime) -> None:
+        started = time.monotonic()
+        try:
+            await job.func(run_at)
+            job.stats.runs += 1
+        except Exception as exc:
+            job.stats.failures += 1
+            logger.error('job %s failed: %s', job.name, exc)
+        finally:
+            duration = time.monotonic() - started
+            job.stats.last_duration = duration
+            job.stats.max_duration = max(job.stats.max_duration, duration)
+            job.stats.total_duration += duration
+            job.running = None
+            if self._jobs.get(job.name) is job:
+                self._plan(job)
 
-async def run_periodic(job: AsyncJob, interval_seconds: float) -> None:
-    while True:
-        await job()
-        await asyncio.sleep(interval_seconds)
+    async def run(self) -> None:
+        while True:
+            fire_at = self._next_fire_at()
+            timeout = None if fire_at is None else max(fire_at - time.time(), 0)
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=timeout)
+                continue
+            except asyncio.TimeoutError:
+                pass
+            now = time.time()
+            for job in self._pop_due(now):
+                self._dispatch(job, now)
 
+    async def stop(self) -> None:
+        """Cancel runs in progress and forget all jobs."""
+        running = [job.running for job in self._jobs.values() if job.running is not None]
+        self._jobs.clear()
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
 
-def schedule_periodic(job: AsyncJob, interval_seconds: float) -> ScheduledJob:
-    loop = asyncio.get_event_loop()
-    task = loop.create_task(run_periodic(job, interval_seconds))
-    return ScheduledJob(task=task)
+    def report(self) -> str:
+        parts = []
+        for name, job in sorted(self._jobs.items()):
+            s = job.stats
+            next_run = job.next_run_at.isoformat() if job.next_run_at else '-'
+            parts.append(
+                f'{name}: runs={s.runs} failures={s.failures} misfires={s.misfires} coalesced={s.coalesced} '
+                f'avg={s.avg_duration:.1f}s max={s.max_duration:.1f}s last={s.last_duration:.1f}s next={next_run}'
+            )
+        return '; '.join(parts)
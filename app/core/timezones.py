@@ -0,0 +1,16 @@
+from datetime import date, datetime, timezone, tzinfo
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+
+@lru_cache(maxsize=1024)
+def get_zone(name: str) -> tzinfo:
+    """ZoneInfo by name, UTC for unknown or empty names."""
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return timezone.utc
+
+
+def local_date(name: str, moment: datetime) -> date:
+    return moment.astimezone(get_zone(name)).date()
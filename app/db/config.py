@@ -12,6 +12,8 @@ def get_tortoise_config(settings: Settings) -> dict[str, object]:
                     'app.db.models.user',
                     'app.db.models.task',
                     'app.db.models.active_timer',
+                    'app.db.models.cron_delivery',
+                    'app.db.models.cron_job_run',
                 ],
                 'default_connection': 'default',
             },
@@ -1,5 +1,5 @@
 from tortoise import fields
-from tortoise.fields import ForeignKeyRelation
+from tortoise.fields import OneToOneRelation
 from tortoise.models import Model
 from tortoise.timezone import now
 
@@ -8,13 +8,17 @@ from app.db.models.task import Task
 
 class ActiveTimer(Model):
     id = fields.IntField(pk=True)
-    task: ForeignKeyRelation[Task] = fields.ForeignKeyField(
+    task: OneToOneRelation[Task] = fields.OneToOneField(
         'models.Task',
-        related_name='active_timers',
+        related_name='active_timer',
         on_delete=fields.OnDelete.CASCADE,
     )
     started_at = fields.DatetimeField(default=now)
     accumulated_seconds = fields.IntField(default=0)
+    chat_id = fields.BigIntField(null=True)
+    message_id = fields.BigIntField(null=True)
+    version = fields.IntField(default=0)
+    updated_at = fields.DatetimeField(default=now)
 
     class Meta:
         table = 'active_timer'
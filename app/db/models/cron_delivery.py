@@ -0,0 +1,31 @@
+from tortoise import fields
+from tortoise.fields import ForeignKeyRelation
+from tortoise.models import Model
+from tortoise.timezone import now
+
+from app.db.models.user import User
+
+
+class DeliveryStatus:
+    PENDING = 'pending'
+    SENT = 'sent'
+
+
+class CronDelivery(Model):
+    id = fields.IntField(pk=True)
+    job = fields.CharField(max_length=32)
+    user: ForeignKeyRelation[User] = fields.ForeignKeyField(
+        'models.User',
+        related_name='cron_deliveries',
+        on_delete=fields.OnDelete.CASCADE,
+    )
+    # за какой период отправлено: день, начало недели или слот напоминаний
+    period = fields.CharField(max_length=32)
+    status = fields.CharField(max_length=16, default=DeliveryStatus.PENDING)
+    # когда доставку взяли в работу: зависшую pending-запись упавшей реплики можно забрать
+    claimed_at = fields.DatetimeField(default=now)
+    delivered_at = fields.DatetimeField(default=now, index=True)
+
+    class Meta:
+        table = 'cron_delivery'
+        unique_together = (('job', 'user', 'period'),)
@@ -0,0 +1,14 @@
+from tortoise import fields
+from tortoise.models import Model
+from tortoise.timezone import now
+
+
+class CronJobRun(Model):
+    id = fields.IntField(pk=True)
+    job = fields.CharField(max_length=32, unique=True)
+    # последний полностью отработанный запуск, с него продолжаем после рестарта
+    last_run_at = fields.DatetimeField()
+    updated_at = fields.DatetimeField(default=now)
+
+    class Meta:
+        table = 'cron_job_run'
@@ -6,7 +6,7 @@ from tortoise.timezone import now
 class User(Model):
     id = fields.IntField(pk=True)
     telegram_id = fields.BigIntField(unique=True)
-    timezone = fields.CharField(max_length=64)
+    timezone = fields.CharField(max_length=64, index=True)
     created_at = fields.DatetimeField(default=now)
 
     class Meta:
@@ -6,18 +6,36 @@ from app.bot.bot import create_bot, create_dispatcher
 from app.core.config import Settings, get_settings
 from app.core.logger import get_logger
 from app.db.init import close_db, init_db
+from app.services.ai_jobs import create_ai_queue
+from app.services.yandex_gpt import YandexGPTClient, create_gpt_client
 
 
 logger = get_logger('main')
 
+REPORT_SECONDS = 10 * 60
+
+
+async def _report_loop(gpt: YandexGPTClient) -> None:
+    while True:
+        await asyncio.sleep(REPORT_SECONDS)
+        logger.info('yandex gpt http: %s', gpt.stats.as_log())
+        if gpt.cache:
+            logger.info('yandex gpt cache: %s', gpt.cache.stats.as_log())
+
 
 async def _run_bot(settings: Settings) -> None:
     await init_db(settings, with_schema=True)
     bot = create_bot(settings)
     dp: Dispatcher = create_dispatcher(settings)
+    gpt = create_gpt_client(settings, dp['redis'])
+    dp['gpt'] = gpt
+    dp['ai_queue'] = create_ai_queue(settings, dp['redis'])
+    report = asyncio.create_task(_report_loop(gpt))
     try:
         await dp.start_polling(bot)
     finally:
+        report.cancel()
+        await gpt.aclose()
         await close_db()
         await bot.session.close()
 
@@ -0,0 +1,145 @@
+from datetime import date, datetime
+from typing import Optional
+
+from redis.asyncio import Redis
+
+from app.core.circuit_breaker import CircuitBreaker
+from app.core.config import Settings
+from app.core.constants import REDIS_AI_JOBS_QUEUE
+from app.core.job_queue import PermanentJobError, QueueJob, RedisJobQueue, RescheduleJob
+from app.services.ai_service import build_daily_summary_prompt, build_weekly_report_prompt
+from app.services.yandex_gpt import CompletionError, OperationFailed, YandexGPTClient
+
+
+AI_JOB_DAILY_SUMMARY = 'daily_summary'
+AI_JOB_WEEKLY_REPORT = 'weekly_report'
+# саммари дня, сгенерированное заранее: ответ только кладётся в кеш, ничего не отправляется
+AI_JOB_DAILY_PRECOMPUTE = 'daily_precompute'
+# ответ на кнопку в меню ИИ, который не удалось получить сразу
+AI_JOB_ON_DEMAND = 'on_demand'
+
+
+def create_ai_queue(settings: Settings, redis: Redis) -> RedisJobQueue:
+    config = settings.ai_queue
+    return RedisJobQueue(
+        redis,
+        REDIS_AI_JOBS_QUEUE,
+        consumer=settings.cron.worker_id,
+        max_attempts=config.max_attempts,
+        backoff_base_seconds=config.backoff_base_seconds,
+        backoff_max_seconds=config.backoff_max_seconds,
+        claim_idle_seconds=config.claim_idle_seconds,
+        dead_letter_maxlen=config.dead_letter_maxlen,
+    )
+
+
+def create_ai_breaker(settings: Settings) -> CircuitBreaker:
+    config = settings.ai_queue
+    return CircuitBreaker(
+        failure_ratio=config.breaker_failure_ratio,
+        window=config.breaker_window,
+        min_calls=config.breaker_min_calls,
+        open_seconds=config.breaker_open_seconds,
+    )
+
+
+async def enqueue_summary(queue: RedisJobQueue, kind: str, user_id: int, telegram_id: int, day: date) -> QueueJob:
+    """Daily summary or weekly report for the day (week start), delivered by message."""
+    return await queue.enqueue(kind, {'user_id': user_id, 'telegram_id': telegram_id, 'date': day.isoformat()})
+
+
+async def enqueue_precompute(queue: RedisJobQueue, user_id: int, day: date, deliver_at: datetime) -> QueueJob:
+    """Daily summary generated ahead of delivery; pointless once deliver_at has passed."""
+    return await queue.enqueue(
+        AI_JOB_DAILY_PRECOMPUTE,
+        {'user_id': user_id, 'date': day.isoformat(), 'deliver_at': deliver_at.timestamp()},
+    )
+
+
+async def enqueue_on_demand(
+    queue: RedisJobQueue,
+    kind: str,
+    user_id: int,
+    day: date,
+    chat_id: int,
+    message_id: int,
+) -> QueueJob:
+    """Summary the user asked for; the answer replaces the text of the given message."""
+    return await queue.enqueue(
+        AI_JOB_ON_DEMAND,
+        {
+            'kind': kind,
+            'user_id': user_id,
+            'date': day.isoformat(),
+            'chat_id': chat_id,
+            'message_id': message_id,
+        },
+    )
+
+
+async def build_job_prompt(job: QueueJob) -> Optional[str]:
+    payload = job.payload
+    kind = payload['kind'] if job.kind == AI_JOB_ON_DEMAND else job.kind
+    day = date.fromisoformat(payload['date'])
+    if kind in (AI_JOB_DAILY_SUMMARY, AI_JOB_DAILY_PRECOMPUTE):
+        return await build_daily_summary_prompt(payload['user_id'], day)
+    if kind == AI_JOB_WEEKLY_REPORT:
+        return await build_weekly_report_prompt(payload['user_id'], day)
+    raise PermanentJobError(f'unknown ai job kind {kind!r}')
+
+
+async def _generate_deferred(job: QueueJob, gpt: YandexGPTClient) -> Optional[str]:
+    """Submit the completion on the first run, poll the operation on the next ones.
+
+    The job comes back every poll_interval_seconds until the operation is done,
+    so a burst of submitted jobs is polled together round by round. A failed
+    or overdue operation is dropped from the payload and the retry submits a
+    new one.
+    """
+    payload = job.payload
+    config = gpt.config
+    operation_id = payload.get('operation_id')
+    if operation_id is None:
+        prompt = await build_job_prompt(job)
+        if prompt is None:
+            return None
+        cached = await gpt.cached_completion(prompt)
+        if cached is not None:
+            return cached
+        payload['operation_id'] = await gpt.submit_completion(prompt)
+        payload['cache_key'] = gpt.completion_key(prompt)
+        payload['polls'] = 0
+        raise RescheduleJob(config.poll_interval_seconds)
+    try:
+        done, text = await gpt.get_operation(operation_id, payload['cache_key'])
+    except OperationFailed:
+        # операции больше нет — при повторе отправим запрос заново
+        payload.pop('operation_id')
+        raise
+    if done:
+        return text
+    payload['polls'] += 1
+    if payload['polls'] >= config.poll_max_rounds:
+        payload.pop('operation_id')
+        raise OperationFailed(f'operation {operation_id} not done after {payload["polls"]} polls')
+    raise RescheduleJob(config.poll_interval_seconds)
+
+
+async def generate_job_text(job: QueueJob, gpt: YandexGPTClient, deferred: bool = False) -> Optional[str]:
+    """Answer for the job, None when there is nothing to send.
+
+    Deferred jobs go through the asynchronous API and raise RescheduleJob
+    while the operation runs. Errors worth retrying (network, 429, 5xx)
+    propagate as CompletionError, the rest become PermanentJobError.
+    """
+    try:
+        if deferred:
+            return await _generate_deferred(job, gpt)
+        prompt = await build_job_prompt(job)
+        if prompt is None:
+            return None
+        return await gpt.request_completion(prompt)
+    except CompletionError as exc:
+        if exc.retryable:
+            raise
+        raise PermanentJobError(str(exc)) from exc
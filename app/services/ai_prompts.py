@@ -1,4 +1,5 @@
-from typing import Sequence
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
 
 
 SYSTEM_PROMPT = 'Ты помощник по личной продуктивности. Отвечай кратко и по делу.'
@@ -17,6 +18,107 @@ WEEKLY_PROMPT_TEMPLATE = (
 )
 
 
+# грубая оценка для русского текста: токенизаторы YandexGPT дают 3-4 символа на токен, берём с запасом
+CHARS_PER_TOKEN = 3
+# сколько токенов может занять список задач в промпте дня
+DAILY_TASKS_TOKEN_BUDGET = 1000
+DAILY_OUTLIERS_LIMIT = 10
+# сколько групп категория/статус показываем, остальные сворачиваем в одну строку
+DAILY_GROUPS_LIMIT = 15
+TITLE_MAX_CHARS = 60
+NO_CATEGORY = 'без категории'
+
+
+@dataclass
+class PromptTask:
+    title: str
+    status: str
+    planned_seconds: int
+    spent_seconds: int
+    category: Optional[str] = None
+    score: Optional[int] = None
+
+    @property
+    def deviation_seconds(self) -> int:
+        return abs(self.spent_seconds - self.planned_seconds)
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def _shorten(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit - 1] + '…'
+
+
+def _task_line(t: PromptTask, title_limit: Optional[int] = None) -> str:
+    title = t.title if title_limit is None else _shorten(t.title, title_limit)
+    score_part = f', оценка {t.score}' if t.score is not None else ''
+    return (
+        f'- {title}: план {t.planned_seconds // 60} мин, факт {t.spent_seconds // 60} мин, '
+        f'статус {t.status}{score_part}'
+    )
+
+
+def _group_lines(tasks: Sequence[PromptTask], limit: int) -> List[str]:
+    groups: Dict[Tuple[str, str], List[int]] = {}
+    for t in tasks:
+        category = _shorten(t.category or NO_CATEGORY, TITLE_MAX_CHARS)
+        totals = groups.setdefault((category, t.status), [0, 0, 0])
+        totals[0] += 1
+        totals[1] += t.planned_seconds
+        totals[2] += t.spent_seconds
+    # самые «тяжёлые» по факту группы сверху
+    ordered = sorted(groups.items(), key=lambda item: (-item[1][2], -item[1][0], item[0]))
+    lines = [
+        f'- {category}, {status}: задач {count}, план {planned // 60} мин, факт {spent // 60} мин'
+        for (category, status), (count, planned, spent) in ordered[:limit]
+    ]
+    rest = ordered[limit:]
+    if rest:
+        lines.append(
+            f'- прочие группы ({len(rest)}): задач {sum(v[0] for _, v in rest)}, '
+            f'план {sum(v[1] for _, v in rest) // 60} мин, факт {sum(v[2] for _, v in rest) // 60} мин',
+        )
+    return lines
+
+
+def _compact_lines(tasks: Sequence[PromptTask], outliers: int, groups: int) -> List[str]:
+    top = sorted(tasks, key=lambda t: t.deviation_seconds, reverse=True)[:outliers]
+    lines = [f'Задачи по категориям и статусам (всего {len(tasks)}):']
+    lines += _group_lines(tasks, groups)
+    if top:
+        lines.append('Самые большие расхождения план/факт:')
+        lines += [_task_line(t, TITLE_MAX_CHARS) for t in top]
+    rest = len(tasks) - len(top)
+    if rest:
+        lines.append(f'Остальные задачи ({rest}) отличаются от плана меньше.')
+    return lines
+
+
+def daily_task_lines(tasks: Sequence[PromptTask], budget_tokens: int = DAILY_TASKS_TOKEN_BUDGET) -> List[str]:
+    """Task part of the daily prompt, kept within budget_tokens.
+
+    Fits: one line per task, as always. Over budget: totals per category and
+    status plus the tasks whose fact deviates from the plan the most; outliers
+    and then groups are cut until the estimate fits.
+    """
+    if not tasks:
+        return []
+    lines = ['Задачи:'] + [_task_line(t) for t in tasks]
+    if estimate_tokens('\n'.join(lines)) <= budget_tokens:
+        return lines
+    outliers, groups = DAILY_OUTLIERS_LIMIT, DAILY_GROUPS_LIMIT
+    while True:
+        lines = _compact_lines(tasks, outliers, groups)
+        if estimate_tokens('\n'.join(lines)) <= budget_tokens or (outliers == 0 and groups == 0):
+            return lines
+        if outliers > 0:
+            outliers -= 1
+        else:
+            groups -= 1
+
+
 def build_daily_prompt(lines: Sequence[str]) -> str:
     body = '\n'.join(lines)
     return DAILY_PROMPT_TEMPLATE.format(body=body)
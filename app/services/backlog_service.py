@@ -1,8 +1,34 @@
+import asyncio
+from dataclasses import dataclass
 from datetime import date, timedelta
-from typing import Dict, List
+import time
+from typing import Dict, List, Optional
 
 from app.db.models.task import Task, TaskStatus
 from app.db.models.user import User
+from app.services.task_archive_service import ARCHIVE_COLUMNS, write_task_archive
+
+
+CLEANUP_BATCH_SIZE = 1000
+CLEANUP_PAUSE_SECONDS = 0.2
+
+
+@dataclass
+class CleanupReport:
+    deleted: int = 0
+    archived: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+
+    @property
+    def per_second(self) -> float:
+        return self.deleted / self.seconds if self.seconds else 0.0
+
+    def as_log(self) -> str:
+        return (
+            f'deleted={self.deleted} archived={self.archived} batches={self.batches} '
+            f'seconds={self.seconds:.1f} rate={self.per_second:.0f}/s'
+        )
 
 
 async def list_backlog(user: User, today: date, days: int = 30) -> Dict[date, List[Task]]:
@@ -25,7 +51,37 @@ async def list_backlog_for_day(user: User, day: date) -> List[Task]:
     ).exclude(status=TaskStatus.COMPLETED).order_by('id')
 
 
-async def cleanup_old_tasks(before: date) -> None:
-    await Task.filter(date__lt=before).delete()
+async def cleanup_old_tasks(
+    before: date,
+    batch_size: int = CLEANUP_BATCH_SIZE,
+    pause_seconds: float = CLEANUP_PAUSE_SECONDS,
+    archive_dir: Optional[str] = None,
+) -> CleanupReport:
+    """Delete tasks older than before in short batches.
+
+    Each batch is its own small DELETE by primary key, with a pause after it,
+    so locks and WAL stay bounded and the bot's writes are not stalled. With
+    archive_dir the rows are first appended to monthly archive files.
+    """
+    report = CleanupReport()
+    started = time.monotonic()
+    while True:
+        query = Task.filter(date__lt=before).order_by('id').limit(batch_size)
+        if archive_dir:
+            rows = await query.values(*ARCHIVE_COLUMNS)
+            ids = [row['id'] for row in rows]
+            if rows:
+                report.archived += await asyncio.to_thread(write_task_archive, archive_dir, rows)
+        else:
+            ids = await query.values_list('id', flat=True)
+        if not ids:
+            break
+        report.deleted += await Task.filter(id__in=ids).delete()
+        report.batches += 1
+        if len(ids) < batch_size:
+            break
+        await asyncio.sleep(pause_seconds)
+    report.seconds = time.monotonic() - started
+    return report
 
 
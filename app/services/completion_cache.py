@@ -0,0 +1,102 @@
+from dataclasses import dataclass
+import hashlib
+import json
+import time
+from typing import Any, Dict, Optional
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.core.constants import REDIS_AI_CACHE_INDEX, REDIS_AI_CACHE_PREFIX
+from app.core.logger import get_logger
+
+
+logger = get_logger('completion_cache')
+
+
+@dataclass
+class CompletionCacheStats:
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evicted: int = 0
+    too_large: int = 0
+    # Redis недоступен или не ответил вовремя
+    errors: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def as_log(self) -> str:
+        return (
+            f'hits={self.hits} misses={self.misses} hit_rate={self.hit_rate:.0%} '
+            f'stores={self.stores} evicted={self.evicted} too_large={self.too_large} errors={self.errors}'
+        )
+
+
+def completion_key(body: Dict[str, Any]) -> str:
+    """Hash of the whole request body: model, options and every prompt message."""
+    raw = json.dumps(body, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class CompletionCache:
+    """Redis cache of LLM answers keyed by request hash.
+
+    Entries expire after ttl_seconds. An index sorted by store time keeps at
+    most max_entries of them, the oldest are evicted first. Answers longer
+    than max_bytes are not cached. The cache is best-effort: Redis errors
+    count as a miss (or a skipped store) and never reach the caller.
+    """
+
+    def __init__(self, redis: Redis, ttl_seconds: int, max_entries: int, max_bytes: int) -> None:
+        self.redis = redis
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stats = CompletionCacheStats()
+
+    async def get(self, key: str) -> Optional[str]:
+        try:
+            text = await self.redis.get(REDIS_AI_CACHE_PREFIX + key)
+        except RedisError as exc:
+            self.stats.errors += 1
+            logger.warning('completion cache get error: %s', exc)
+            return None
+        if text is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return text
+
+    async def put(self, key: str, text: str) -> None:
+        if len(text.encode('utf-8')) > self.max_bytes:
+            self.stats.too_large += 1
+            return
+        try:
+            await self._store(key, text)
+        except RedisError as exc:
+            self.stats.errors += 1
+            logger.warning('completion cache put error: %s', exc)
+
+    async def _store(self, key: str, text: str) -> None:
+        now = time.time()
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(REDIS_AI_CACHE_PREFIX + key, text, ex=self.ttl_seconds)
+            pipe.zadd(REDIS_AI_CACHE_INDEX, {key: now})
+            # истёкшие по TTL ключи из индекса тоже убираем
+            pipe.zremrangebyscore(REDIS_AI_CACHE_INDEX, '-inf', now - self.ttl_seconds)
+            pipe.zcard(REDIS_AI_CACHE_INDEX)
+            *_, size = await pipe.execute()
+        self.stats.stores += 1
+        if size > self.max_entries:
+            await self._evict(size - self.max_entries)
+
+    async def _evict(self, count: int) -> None:
+        oldest = await self.redis.zpopmin(REDIS_AI_CACHE_INDEX, count)
+        if not oldest:
+            return
+        await self.redis.delete(*(REDIS_AI_CACHE_PREFIX + key for key, _ in oldest))
+        self.stats.evicted += len(oldest)
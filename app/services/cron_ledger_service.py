@@ -0,0 +1,102 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+from tortoise.exceptions import IntegrityError
+from tortoise.queryset import QuerySet
+from tortoise.timezone import now
+
+from app.db.models.cron_delivery import CronDelivery, DeliveryStatus
+from app.db.models.cron_job_run import CronJobRun
+
+
+class ClaimResult:
+    CLAIMED = 'claimed'
+    DELIVERED = 'delivered'
+    # доставку держит другой прогон, который ещё может её отправить
+    BUSY = 'busy'
+
+
+@dataclass
+class DeliveryClaim:
+    result: str
+    # claimed_at, записанный этим прогоном: по нему видно, что заявку не забрал другой
+    token: Optional[datetime] = None
+
+
+async def claim_delivery(job: str, user_id: int, period: str, stale_seconds: float) -> DeliveryClaim:
+    """Reserve a (job, user, period) delivery before sending.
+
+    The claim is written as a pending row, so two replicas during a failover
+    or a resumed broadcast never send the same message twice. A pending claim
+    older than stale_seconds belongs to a run that died before sending and is
+    taken over; only rows marked sent are final. The returned token must be
+    passed to mark_delivered or release_delivery.
+    """
+    claimed_at = now()
+    try:
+        await CronDelivery.create(job=job, user_id=user_id, period=period, claimed_at=claimed_at)
+        return DeliveryClaim(ClaimResult.CLAIMED, claimed_at)
+    except IntegrityError:
+        pass
+    taken = await CronDelivery.filter(
+        job=job,
+        user_id=user_id,
+        period=period,
+        status=DeliveryStatus.PENDING,
+        claimed_at__lt=claimed_at - timedelta(seconds=stale_seconds),
+    ).update(claimed_at=claimed_at)
+    if taken:
+        return DeliveryClaim(ClaimResult.CLAIMED, claimed_at)
+    sent = await CronDelivery.filter(job=job, user_id=user_id, period=period, status=DeliveryStatus.SENT).exists()
+    return DeliveryClaim(ClaimResult.DELIVERED if sent else ClaimResult.BUSY)
+
+
+def _own_claim(job: str, user_id: int, period: str, token: datetime) -> QuerySet[CronDelivery]:
+    # заявку могли забрать как устаревшую: трогаем запись, только пока она наша и ещё не отправлена
+    return CronDelivery.filter(
+        job=job,
+        user_id=user_id,
+        period=period,
+        status=DeliveryStatus.PENDING,
+        claimed_at=token,
+    )
+
+
+async def mark_delivered(job: str, user_id: int, period: str, token: datetime) -> bool:
+    """Mark a claimed delivery sent; False if another run took the claim over meanwhile."""
+    updated = await _own_claim(job, user_id, period, token).update(
+        status=DeliveryStatus.SENT,
+        delivered_at=now(),
+    )
+    return bool(updated)
+
+
+async def release_delivery(job: str, user_id: int, period: str, token: datetime) -> None:
+    """Drop a claim whose message was not sent, so a later run can retry it."""
+    await _own_claim(job, user_id, period, token).delete()
+
+
+async def cleanup_deliveries(before: datetime) -> int:
+    return await CronDelivery.filter(delivered_at__lt=before).delete()
+
+
+async def get_last_run(job: str) -> Optional[datetime]:
+    run = await CronJobRun.get_or_none(job=job)
+    return run.last_run_at if run else None
+
+
+async def set_last_run(job: str, run_at: datetime) -> None:
+    """Move the job watermark forward, never back."""
+    run = await CronJobRun.get_or_none(job=job)
+    if run is None:
+        try:
+            await CronJobRun.create(job=job, last_run_at=run_at)
+            return
+        except IntegrityError:
+            run = await CronJobRun.get(job=job)
+    if run.last_run_at >= run_at:
+        return
+    run.last_run_at = run_at
+    run.updated_at = now()
+    await run.save(update_fields=['last_run_at', 'updated_at'])
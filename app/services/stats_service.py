@@ -1,8 +1,11 @@
 from dataclasses import dataclass
 from datetime import date, timedelta
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
-from app.db.models.task import Task
+from tortoise.expressions import Q
+from tortoise.functions import Count, Sum
+
+from app.db.models.task import Task, TaskStatus
 from app.db.models.user import User
 
 
@@ -22,25 +25,107 @@ class WeeklyStats:
     by_day: Dict[date, DailyStats]
 
 
-async def get_daily_stats(user: User, day: date) -> DailyStats:
-    """Collect stats for day."""
-    tasks = await Task.filter(user=user, date=day).order_by('id')
-    planned = sum(t.planned_seconds for t in tasks)
-    spent = sum(t.spent_seconds for t in tasks)
-    completed = sum(1 for t in tasks if t.status == 'completed')
+@dataclass
+class DayTotals:
+    day: date
+    planned_seconds: int = 0
+    spent_seconds: int = 0
+    total_tasks: int = 0
+    completed_tasks: int = 0
+
+
+@dataclass
+class RangeTotals:
+    start: date
+    end: date
+    by_day: Dict[date, DayTotals]
+
+    @property
+    def planned_seconds(self) -> int:
+        return sum(d.planned_seconds for d in self.by_day.values())
+
+    @property
+    def spent_seconds(self) -> int:
+        return sum(d.spent_seconds for d in self.by_day.values())
+
+    @property
+    def total_tasks(self) -> int:
+        return sum(d.total_tasks for d in self.by_day.values())
+
+    @property
+    def completed_tasks(self) -> int:
+        return sum(d.completed_tasks for d in self.by_day.values())
+
+
+def _days(start: date, end: date) -> List[date]:
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def month_range(day: date) -> Tuple[date, date]:
+    start = day.replace(day=1)
+    next_month = (start + timedelta(days=32)).replace(day=1)
+    return start, next_month - timedelta(days=1)
+
+
+def last_days_range(day: date, days: int = 30) -> Tuple[date, date]:
+    return day - timedelta(days=days - 1), day
+
+
+def _daily_stats(day: date, tasks: List[Task]) -> DailyStats:
     return DailyStats(
         day=day,
-        planned_seconds=planned,
-        spent_seconds=spent,
-        completed_tasks=completed,
+        planned_seconds=sum(t.planned_seconds for t in tasks),
+        spent_seconds=sum(t.spent_seconds for t in tasks),
+        completed_tasks=sum(1 for t in tasks if t.status == TaskStatus.COMPLETED),
         tasks=tasks,
     )
 
 
+async def get_daily_stats(user: User, day: date) -> DailyStats:
+    """Collect stats for day."""
+    tasks = await Task.filter(user=user, date=day).order_by('id')
+    return _daily_stats(day, tasks)
+
+
+async def get_range_stats(user: User, start: date, end: date) -> WeeklyStats:
+    """Collect stats with tasks for every day of [start, end] in one query."""
+    tasks = await Task.filter(user=user, date__gte=start, date__lte=end).order_by('date', 'id')
+    grouped: Dict[date, List[Task]] = {day: [] for day in _days(start, end)}
+    for t in tasks:
+        grouped[t.date].append(t)
+    by_day = {day: _daily_stats(day, day_tasks) for day, day_tasks in grouped.items()}
+    return WeeklyStats(start=start, end=end, by_day=by_day)
+
+
+async def get_range_totals(user: User, start: date, end: date) -> RangeTotals:
+    """Per-day sums for [start, end] aggregated by the database, without loading tasks."""
+    rows = await Task.filter(
+        user=user,
+        date__gte=start,
+        date__lte=end,
+    ).annotate(
+        planned=Sum('planned_seconds'),
+        spent=Sum('spent_seconds'),
+        task_count=Count('id'),
+        completed_count=Count('id', _filter=Q(status=TaskStatus.COMPLETED)),
+    ).group_by('date').values('date', 'planned', 'spent', 'task_count', 'completed_count')
+    by_day = {day: DayTotals(day=day) for day in _days(start, end)}
+    for row in rows:
+        by_day[row['date']] = DayTotals(
+            day=row['date'],
+            planned_seconds=int(row['planned'] or 0),
+            spent_seconds=int(row['spent'] or 0),
+            total_tasks=row['task_count'],
+            completed_tasks=row['completed_count'],
+        )
+    return RangeTotals(start=start, end=end, by_day=by_day)
+
+
 async def get_weekly_stats(user: User, start: date) -> WeeklyStats:
     """Collect stats for week starting from date."""
-    by_day: Dict[date, DailyStats] = {}
-    for i in range(7):
-        day = start + timedelta(days=i)
-        by_day[day] = await get_daily_stats(user, day)
-    return WeeklyStats(start=start, end=start + timedelta(days=6), by_day=by_day)
+    return await get_range_stats(user, start, start + timedelta(days=6))
+
+
+async def get_weekly_totals(user: User, start: date) -> RangeTotals:
+    """Per-day sums for week starting from date."""
+    return await get_range_totals(user, start, start + timedelta(days=6))
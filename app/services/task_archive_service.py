@@ -0,0 +1,56 @@
+"""Monthly archives of deleted tasks.
+
+Archive files are `tasks-YYYY-MM.jsonl.gz` in the archive directory. Every
+line is one cleanup batch stored column by column ({"id": [...], "title":
+[...], ...}), which compresses much better than row objects and is easy to
+load into dataframes. Batches are appended as separate gzip members, so a file
+is never rewritten. A crash between archiving and deleting can archive a row
+twice, readers should deduplicate by id.
+"""
+from collections.abc import Iterator
+from datetime import date
+import gzip
+import json
+import os
+from typing import Any, Dict, List, Sequence
+
+
+ARCHIVE_COLUMNS = ('id', 'user_id', 'title', 'planned_seconds', 'spent_seconds', 'date', 'status', 'score', 'category')
+
+
+def archive_path(directory: str, month: date) -> str:
+    return os.path.join(directory, f'tasks-{month:%Y-%m}.jsonl.gz')
+
+
+def _to_columns(rows: Sequence[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    columns: Dict[str, List[Any]] = {name: [] for name in ARCHIVE_COLUMNS}
+    for row in rows:
+        for name in ARCHIVE_COLUMNS:
+            value = row[name]
+            columns[name].append(value.isoformat() if isinstance(value, date) else value)
+    return columns
+
+
+def write_task_archive(directory: str, rows: Sequence[Dict[str, Any]]) -> int:
+    """Append rows to the archive of their month, returns how many were written."""
+    by_month: Dict[date, List[Dict[str, Any]]] = {}
+    for row in rows:
+        by_month.setdefault(row['date'].replace(day=1), []).append(row)
+    os.makedirs(directory, exist_ok=True)
+    for month, month_rows in by_month.items():
+        line = json.dumps(_to_columns(month_rows), ensure_ascii=False, separators=(',', ':'))
+        with gzip.open(archive_path(directory, month), 'at', encoding='utf-8') as f:
+            f.write(line + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+    return len(rows)
+
+
+def iter_task_archive(path: str) -> Iterator[Dict[str, Any]]:
+    """Rows of an archive file, batch by batch."""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            columns = json.loads(line)
+            names = list(columns)
+            for values in zip(*(columns[name] for name in names)):
+                yield dict(zip(names, values))
@@ -1,11 +1,18 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import date
-from typing import List, Optional
+from itertools import groupby
+from typing import AsyncIterable, AsyncIterator, List, Optional, Sequence, Union
 
 from tortoise.expressions import Q
+from tortoise.functions import Count
 
 from app.db.models.task import Task, TaskStatus
 from app.db.models.user import User
+from app.services.user_service import UserRef
+
+
+PENDING_TASKS_BATCH_SIZE = 500
+PENDING_STATUSES = (TaskStatus.PLANNED, TaskStatus.ACTIVE, TaskStatus.PAUSED)
 
 
 @dataclass
@@ -17,6 +24,21 @@ class TaskCreateData:
     category: Optional[str] = None
 
 
+@dataclass
+class PendingTask:
+    id: int
+    status: str
+    title: str
+    planned_seconds: int
+
+
+@dataclass
+class UserPendingTasks:
+    user_id: int
+    telegram_id: int
+    tasks: List[PendingTask] = field(default_factory=list)
+
+
 async def create_task(data: TaskCreateData) -> Task:
     """Create new task."""
     task = await Task.create(
@@ -46,6 +68,64 @@ async def list_active_or_planned_for_today(user: User, today: date) -> List[Task
     ).order_by('id')
 
 
+async def iter_pending_tasks(
+    user_batches: AsyncIterable[Sequence[Union[User, UserRef]]],
+    day: date,
+    batch_size: int = PENDING_TASKS_BATCH_SIZE,
+) -> AsyncIterator[UserPendingTasks]:
+    """Not completed tasks of day grouped by user, one query per batch of users.
+
+    Users without such tasks are not yielded. Only the columns needed to render
+    a task list are selected.
+    """
+    async for users in user_batches:
+        for i in range(0, len(users), batch_size):
+            batch = {u.id: u for u in users[i:i + batch_size]}
+            rows = await Task.filter(
+                user_id__in=list(batch),
+                date=day,
+                status__in=PENDING_STATUSES,
+            ).order_by('user_id', 'id').values('id', 'user_id', 'status', 'title', 'planned_seconds')
+            for user_id, group in groupby(rows, key=lambda r: r['user_id']):
+                yield UserPendingTasks(
+                    user_id=user_id,
+                    telegram_id=batch[user_id].telegram_id,
+                    tasks=[
+                        PendingTask(
+                            id=r['id'],
+                            status=r['status'],
+                            title=r['title'],
+                            planned_seconds=r['planned_seconds'],
+                        )
+                        for r in group
+                    ],
+                )
+
+
+async def iter_idle_day_users(
+    user_batches: AsyncIterable[Sequence[UserRef]],
+    day: date,
+    batch_size: int = PENDING_TASKS_BATCH_SIZE,
+) -> AsyncIterator[UserRef]:
+    """Users who have tasks on day and no timer running right now.
+
+    Their daily stats only change if they come back to the bot, so a summary
+    generated now is likely the one they get at delivery time.
+    """
+    async for users in user_batches:
+        for i in range(0, len(users), batch_size):
+            batch = {u.id: u for u in users[i:i + batch_size]}
+            rows = await Task.filter(
+                user_id__in=list(batch),
+                date=day,
+            ).annotate(
+                running=Count('id', _filter=Q(status=TaskStatus.ACTIVE)),
+            ).group_by('user_id').values('user_id', 'running')
+            for row in rows:
+                if not row['running']:
+                    yield batch[row['user_id']]
+
+
 async def get_task_for_user(task_id: int, user: User) -> Optional[Task]:
     """Get task by id for user."""
     return await Task.get_or_none(id=task_id, user=user)
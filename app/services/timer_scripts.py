@@ -0,0 +1,150 @@
+"""Lua scripts for atomic timer state transitions.
+
+Timer hash fields: started_ts (unix time the running segment started),
+accumulated_seconds, resumed_seconds (accumulated_seconds at the last start or
+resume), planned_seconds, chat_id, message_id, last_update_ts and version
+(bumped on every write). The tick script touches timer hashes that are
+not listed in KEYS, so these scripts assume a single Redis node.
+"""
+from typing import Dict
+
+from redis.asyncio import Redis
+from redis.commands.core import AsyncScript
+
+
+# KEYS: timer hash, partition index
+# ARGV: task_id, now_ts, accumulated_seconds, planned_seconds, chat_id, message_id, events channel,
+#       '1' to keep an already running timer untouched
+# returns version, deadline, accumulated_seconds
+START_TIMER = """
+local fields = redis.call('hmget', KEYS[1], 'started_ts', 'accumulated_seconds', 'resumed_seconds')
+local running = fields[1] and fields[2]
+if ARGV[8] == '1' and redis.call('exists', KEYS[1]) == 1 then
+    return false
+end
+local started = tonumber(ARGV[2])
+local accumulated = tonumber(ARGV[3])
+local resumed = ARGV[3]
+if running then
+    -- таймер уже идёт (двойное нажатие, старт из списка): набежавшее время не сбрасываем,
+    -- меняются только сообщение и план
+    local delta = math.floor(started - tonumber(fields[1]))
+    if delta < 0 then
+        delta = 0
+    end
+    started = tonumber(fields[1]) + delta
+    accumulated = tonumber(fields[2]) + delta
+    resumed = fields[3] or fields[2]
+end
+local deadline = started + tonumber(ARGV[4]) - accumulated
+local version = redis.call('hincrby', KEYS[1], 'version', 1)
+redis.call('hset', KEYS[1],
+    'started_ts', string.format('%.6f', started),
+    'accumulated_seconds', accumulated,
+    'resumed_seconds', resumed,
+    'planned_seconds', ARGV[4],
+    'last_update_ts', ARGV[2])
+if ARGV[5] ~= '' then
+    redis.call('hset', KEYS[1], 'chat_id', ARGV[5])
+end
+if ARGV[6] ~= '' then
+    redis.call('hset', KEYS[1], 'message_id', ARGV[6])
+end
+redis.call('zadd', KEYS[2], deadline, ARGV[1])
+redis.call('publish', ARGV[7], cjson.encode({task_id = tonumber(ARGV[1]), deadline = deadline}))
+return {version, string.format('%.6f', deadline), accumulated}
+"""
+
+# KEYS: timer hash, partition index
+# ARGV: task_id, now_ts, events channel
+PAUSE_TIMER = """
+local fields = redis.call('hmget', KEYS[1], 'started_ts', 'accumulated_seconds', 'version')
+redis.call('zrem', KEYS[2], ARGV[1])
+redis.call('del', KEYS[1])
+if not fields[1] or not fields[2] then
+    return false
+end
+local delta = math.floor(tonumber(ARGV[2]) - tonumber(fields[1]))
+if delta < 0 then
+    delta = 0
+end
+redis.call('publish', ARGV[3], cjson.encode({task_id = tonumber(ARGV[1]), deadline = cjson.null}))
+return {tonumber(fields[2]) + delta, (tonumber(fields[3]) or 0) + 1}
+"""
+
+# KEYS: timer hash, partition index
+# ARGV: task_id, now_ts, events channel
+# то же, что пауза, но только если дедлайн в индексе наступил: продление, пришедшее
+# после того как воркер решил завершить таймер, не теряется
+COMPLETE_TIMER = """
+local deadline = redis.call('zscore', KEYS[2], ARGV[1])
+if not deadline or tonumber(deadline) > tonumber(ARGV[2]) then
+    return false
+end
+local fields = redis.call('hmget', KEYS[1], 'started_ts', 'accumulated_seconds', 'version')
+redis.call('zrem', KEYS[2], ARGV[1])
+redis.call('del', KEYS[1])
+if not fields[1] or not fields[2] then
+    return false
+end
+local delta = math.floor(tonumber(ARGV[2]) - tonumber(fields[1]))
+if delta < 0 then
+    delta = 0
+end
+redis.call('publish', ARGV[3], cjson.encode({task_id = tonumber(ARGV[1]), deadline = cjson.null}))
+return {tonumber(fields[2]) + delta, (tonumber(fields[3]) or 0) + 1}
+"""
+
+# KEYS: partition indexes
+# ARGV: now_ts, timer hash prefix
+# returns flat rows: task_id, total_seconds, chat_id, message_id, deadline, version, resumed_seconds
+TICK_TIMERS = """
+local now = tonumber(ARGV[1])
+local out = {}
+for _, index in ipairs(KEYS) do
+    local entries = redis.call('zrange', index, 0, -1, 'WITHSCORES')
+    for i = 1, #entries, 2 do
+        local task_id = entries[i]
+        local key = ARGV[2] .. task_id
+        local fields = redis.call('hmget', key,
+            'started_ts', 'accumulated_seconds', 'chat_id', 'message_id', 'version', 'resumed_seconds')
+        if not fields[1] or not fields[2] then
+            redis.call('zrem', index, task_id)
+        else
+            local started = tonumber(fields[1])
+            local delta = math.floor(now - started)
+            if delta >= 0 then
+                local total = tonumber(fields[2]) + delta
+                local version = tonumber(fields[5]) or 0
+                if delta > 0 then
+                    -- сдвигаем старт ровно на учтённые секунды, чтобы дедлайн в индексе не уплывал
+                    version = redis.call('hincrby', key, 'version', 1)
+                    redis.call('hset', key,
+                        'started_ts', string.format('%.6f', started + delta),
+                        'accumulated_seconds', total,
+                        'last_update_ts', ARGV[1])
+                end
+                table.insert(out, task_id)
+                table.insert(out, total)
+                table.insert(out, fields[3] or '')
+                table.insert(out, fields[4] or '')
+                table.insert(out, entries[i + 1])
+                table.insert(out, version)
+                table.insert(out, fields[6] or '')
+            end
+        end
+    end
+end
+return out
+"""
+
+_SCRIPTS: Dict[str, AsyncScript] = {}
+
+
+def get_script(redis: Redis, source: str) -> AsyncScript:
+    """Script object shared by all clients; call it with `client=redis`."""
+    script = _SCRIPTS.get(source)
+    if script is None:
+        script = redis.register_script(source)
+        _SCRIPTS[source] = script
+    return script
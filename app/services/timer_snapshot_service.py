@@ -0,0 +1,72 @@
+from datetime import datetime
+from typing import Iterable, List, Sequence
+
+from redis.asyncio import Redis
+
+from app.db.models.active_timer import ActiveTimer
+from app.db.models.task import TaskStatus
+from app.services.timers_service import TimerTick, restore_timer
+
+
+SNAPSHOT_BATCH_SIZE = 500
+
+
+async def save_timer_snapshots(ticks: Sequence[TimerTick], taken_at: datetime) -> int:
+    """Upsert running timers into active_timer in batches."""
+    if not ticks:
+        return 0
+    rows = [
+        ActiveTimer(
+            task_id=t.task_id,
+            started_at=taken_at,
+            accumulated_seconds=t.total_seconds,
+            chat_id=t.chat_id,
+            message_id=t.message_id,
+            version=t.version,
+            updated_at=taken_at,
+        )
+        for t in ticks
+    ]
+    await ActiveTimer.bulk_create(
+        rows,
+        batch_size=SNAPSHOT_BATCH_SIZE,
+        on_conflict=['task_id'],
+        update_fields=['started_at', 'accumulated_seconds', 'chat_id', 'message_id', 'version', 'updated_at'],
+    )
+    return len(rows)
+
+
+async def delete_timer_snapshots(task_ids: Iterable[int]) -> None:
+    ids = list(task_ids)
+    for i in range(0, len(ids), SNAPSHOT_BATCH_SIZE):
+        await ActiveTimer.filter(task_id__in=ids[i:i + SNAPSHOT_BATCH_SIZE]).delete()
+
+
+async def restore_timers(redis: Redis) -> int:
+    """Put timers of still active tasks back into Redis after it lost them.
+
+    A snapshot says the timer had `accumulated_seconds` at `started_at` and was
+    running, so the restored timer keeps counting from that moment. Timers that
+    are still in Redis are left untouched, snapshots of tasks that are no longer
+    active are dropped.
+    """
+    snapshots = await ActiveTimer.all().select_related('task')
+    restored = 0
+    stale: List[int] = []
+    for snap in snapshots:
+        task = snap.task
+        if task.status != TaskStatus.ACTIVE:
+            stale.append(task.id)
+            continue
+        if await restore_timer(
+            redis,
+            task.id,
+            snap.started_at,
+            snap.accumulated_seconds,
+            task.planned_seconds,
+            snap.chat_id,
+            snap.message_id,
+        ):
+            restored += 1
+    await delete_timer_snapshots(stale)
+    return restored
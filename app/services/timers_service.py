@@ -1,11 +1,55 @@
 from dataclasses import dataclass
+import json
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from redis.asyncio import Redis
 
-from app.core.constants import REDIS_ACTIVE_TIMER_PREFIX
+from app.core.config import TimersConfig
+from app.core.constants import (
+    REDIS_ACTIVE_TIMER_PREFIX,
+    REDIS_ACTIVE_TIMERS_INDEX,
+    REDIS_TASK_CHANGED_CHANNEL,
+    REDIS_TIMER_EVENTS_CHANNEL,
+    TIMER_PARTITIONS,
+)
 from app.db.models.task import Task, TaskStatus
+from app.services.timer_scripts import COMPLETE_TIMER, PAUSE_TIMER, START_TIMER, TICK_TIMERS, get_script
+
+
+@dataclass
+class TimerTick:
+    task_id: int
+    total_seconds: int
+    deadline: float
+    chat_id: Optional[int]
+    message_id: Optional[int]
+    version: int
+    # накопленное время на момент последнего старта или продолжения — его показал хендлер
+    resumed_seconds: int
+
+
+@dataclass
+class TimerTransition:
+    task_id: int
+    version: int
+    total_seconds: int
+    deadline: Optional[float]
+
+
+@dataclass
+class TaskMeta:
+    task_id: int
+    user_id: int
+    telegram_id: int
+    title: str
+    planned_seconds: int
+
+
+@dataclass
+class TimerEvent:
+    task_id: int
+    deadline: Optional[float]
 
 
 @dataclass
@@ -16,70 +60,173 @@ class ActiveTimerData:
     chat_id: Optional[int]
     message_id: Optional[int]
     last_update_at: Optional[datetime]
+    version: int
 
 
 def _key(task_id: int) -> str:
     return f'{REDIS_ACTIVE_TIMER_PREFIX}{task_id}'
 
 
+def partition_of(task_id: int) -> int:
+    return task_id % TIMER_PARTITIONS
+
+
+def _index_key(partition: int) -> str:
+    return f'{REDIS_ACTIVE_TIMERS_INDEX}:{partition}'
+
+
+def parse_timer_event(payload: str) -> Optional[TimerEvent]:
+    try:
+        data = json.loads(payload)
+        return TimerEvent(task_id=int(data['task_id']), deadline=data.get('deadline'))
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
 def _now_utc() -> datetime:
     return datetime.now(timezone.utc)
 
 
-async def get_active_timer(redis: Redis, task_id: int) -> Optional[ActiveTimerData]:
-    raw = await redis.hgetall(_key(task_id))
+def _deadline(started_at: datetime, planned_seconds: int, accumulated_seconds: int) -> float:
+    return started_at.timestamp() + planned_seconds - accumulated_seconds
+
+
+def _parse_ts(raw: dict[str, str], ts_field: str, iso_field: str) -> Optional[datetime]:
+    ts = raw.get(ts_field)
+    if ts:
+        return datetime.fromtimestamp(float(ts), tz=timezone.utc)
+    # хэши, записанные до перехода на Lua-скрипты, хранят время в ISO
+    iso = raw.get(iso_field)
+    return datetime.fromisoformat(iso) if iso else None
+
+
+def _parse_timer(task_id: int, raw: dict[str, str]) -> Optional[ActiveTimerData]:
     if not raw:
         return None
-    started_at_str = raw.get('started_at')
+    started_at = _parse_ts(raw, 'started_ts', 'started_at')
     accumulated_str = raw.get('accumulated_seconds')
-    if not started_at_str or accumulated_str is None:
+    if not started_at or accumulated_str is None:
         return None
-    started_at = datetime.fromisoformat(started_at_str)
     accumulated_seconds = int(accumulated_str)
     chat_id_str = raw.get('chat_id')
     message_id_str = raw.get('message_id')
-    last_update_str = raw.get('last_update_at')
     chat_id = int(chat_id_str) if chat_id_str is not None else None
     message_id = int(message_id_str) if message_id_str is not None else None
-    last_update_at = datetime.fromisoformat(last_update_str) if last_update_str else None
     return ActiveTimerData(
         task_id=task_id,
         started_at=started_at,
         accumulated_seconds=accumulated_seconds,
         chat_id=chat_id,
         message_id=message_id,
-        last_update_at=last_update_at,
+        last_update_at=_parse_ts(raw, 'last_update_ts', 'last_update_at'),
+        version=int(raw.get('version') or 0),
     )
 
 
-async def start_timer(redis: Redis, task: Task, chat_id: Optional[int], message_id: Optional[int]) -> None:
-    now = _now_utc()
-    mapping = {
-        'started_at': now.isoformat(),
-        'accumulated_seconds': task.spent_seconds,
-    }
-    if chat_id is not None:
-        mapping['chat_id'] = str(chat_id)
-    if message_id is not None:
-        mapping['message_id'] = str(message_id)
-    mapping['last_update_at'] = now.isoformat()
-    await redis.hset(_key(task.id), mapping=mapping)
+async def get_active_timer(redis: Redis, task_id: int) -> Optional[ActiveTimerData]:
+    raw = await redis.hgetall(_key(task_id))
+    return _parse_timer(task_id, raw)
+
+
+async def _start(
+    redis: Redis,
+    task_id: int,
+    started_at: datetime,
+    accumulated_seconds: int,
+    planned_seconds: int,
+    chat_id: Optional[int],
+    message_id: Optional[int],
+    only_if_missing: bool = False,
+) -> Optional[TimerTransition]:
+    result = await get_script(redis, START_TIMER)(
+        keys=[_key(task_id), _index_key(partition_of(task_id))],
+        args=[
+            task_id,
+            repr(started_at.timestamp()),
+            accumulated_seconds,
+            planned_seconds,
+            '' if chat_id is None else chat_id,
+            '' if message_id is None else message_id,
+            REDIS_TIMER_EVENTS_CHANNEL,
+            '1' if only_if_missing else '0',
+        ],
+        client=redis,
+    )
+    if not result:
+        return None
+    version, deadline, total = result
+    return TimerTransition(
+        task_id=task_id,
+        version=int(version),
+        total_seconds=int(total),
+        deadline=float(deadline),
+    )
+
+
+async def restore_timer(
+    redis: Redis,
+    task_id: int,
+    started_at: datetime,
+    accumulated_seconds: int,
+    planned_seconds: int,
+    chat_id: Optional[int],
+    message_id: Optional[int],
+) -> bool:
+    """Start a timer from saved state unless it is already running."""
+    transition = await _start(
+        redis,
+        task_id,
+        started_at,
+        accumulated_seconds,
+        planned_seconds,
+        chat_id,
+        message_id,
+        only_if_missing=True,
+    )
+    return transition is not None
+
+
+async def _pause(redis: Redis, task_id: int, source: str = PAUSE_TIMER) -> Optional[TimerTransition]:
+    result = await get_script(redis, source)(
+        keys=[_key(task_id), _index_key(partition_of(task_id))],
+        args=[task_id, repr(_now_utc().timestamp()), REDIS_TIMER_EVENTS_CHANNEL],
+        client=redis,
+    )
+    if not result:
+        return None
+    total, version = result
+    return TimerTransition(task_id=task_id, version=int(version), total_seconds=int(total), deadline=None)
+
+
+async def start_timer(
+    redis: Redis,
+    task: Task,
+    chat_id: Optional[int],
+    message_id: Optional[int],
+) -> Optional[TimerTransition]:
+    """Start or resume the timer; a running one keeps its time and only moves to the new message."""
+    transition = await _start(
+        redis,
+        task.id,
+        _now_utc(),
+        task.spent_seconds,
+        task.planned_seconds,
+        chat_id,
+        message_id,
+    )
     task.status = TaskStatus.ACTIVE
     await task.save()
+    return transition
 
 
 async def pause_timer(redis: Redis, task: Task) -> int:
-    data = await get_active_timer(redis, task.id)
-    if not data:
+    transition = await _pause(redis, task.id)
+    if not transition:
         return task.spent_seconds
-    now = _now_utc()
-    delta = int((now - data.started_at).total_seconds())
-    total = data.accumulated_seconds + max(delta, 0)
-    await redis.delete(_key(task.id))
     task.status = TaskStatus.PAUSED
-    task.spent_seconds = total
+    task.spent_seconds = transition.total_seconds
     await task.save()
-    return total
+    return transition.total_seconds
 
 
 async def stop_timer(redis: Redis, task: Task, completed: bool) -> int:
@@ -90,6 +237,133 @@ async def stop_timer(redis: Redis, task: Task, completed: bool) -> int:
     return total
 
 
+async def complete_timer(redis: Redis, task_id: int) -> Optional[Task]:
+    """Stop a timer whose deadline has passed and mark its task completed.
+
+    Returns None when the timer is no longer running or its deadline was
+    moved (extended) after the caller saw it due.
+    """
+    transition = await _pause(redis, task_id, COMPLETE_TIMER)
+    if not transition:
+        return None
+    task = await Task.get_or_none(id=task_id)
+    if not task:
+        return None
+    task.status = TaskStatus.COMPLETED
+    task.spent_seconds = transition.total_seconds
+    await task.save()
+    return task
+
+
+async def notify_task_changed(redis: Redis, task_id: int) -> None:
+    """Tell timers workers to drop cached title/plan of the task."""
+    await redis.publish(REDIS_TASK_CHANGED_CHANNEL, str(task_id))
+
+
+async def load_task_meta(task_ids: Iterable[int]) -> Dict[int, TaskMeta]:
+    rows = await Task.filter(id__in=list(task_ids)).values(
+        'id', 'user_id', 'title', 'planned_seconds', 'user__telegram_id',
+    )
+    return {
+        row['id']: TaskMeta(
+            task_id=row['id'],
+            user_id=row['user_id'],
+            telegram_id=row['user__telegram_id'],
+            title=row['title'],
+            planned_seconds=row['planned_seconds'],
+        )
+        for row in rows
+    }
+
+
+async def list_running_timers(redis: Redis, partitions: Iterable[int]) -> List[Tuple[int, float]]:
+    """List running timers of partitions as (task_id, deadline timestamp)."""
+    async with redis.pipeline(transaction=False) as pipe:
+        for partition in partitions:
+            pipe.zrange(_index_key(partition), 0, -1, withscores=True)
+        results = await pipe.execute()
+    return [(int(member), score) for entries in results for member, score in entries]
+
+
+async def get_timer_deadline(redis: Redis, task_id: int) -> Optional[float]:
+    return await redis.zscore(_index_key(partition_of(task_id)), str(task_id))
+
+
+async def tick_timers(redis: Redis, now: datetime, partitions: Iterable[int]) -> List[TimerTick]:
+    """Advance running timers of partitions in one atomic script call."""
+    keys = [_index_key(p) for p in partitions]
+    if not keys:
+        return []
+    rows = await get_script(redis, TICK_TIMERS)(
+        keys=keys,
+        args=[repr(now.timestamp()), REDIS_ACTIVE_TIMER_PREFIX],
+        client=redis,
+    )
+    ticks: List[TimerTick] = []
+    for i in range(0, len(rows), 7):
+        task_id, total, chat_id, message_id, deadline, version, resumed = rows[i:i + 7]
+        ticks.append(TimerTick(
+            task_id=int(task_id),
+            total_seconds=int(total),
+            deadline=float(deadline),
+            chat_id=int(chat_id) if chat_id else None,
+            message_id=int(message_id) if message_id else None,
+            version=int(version),
+            resumed_seconds=int(resumed) if resumed else 0,
+        ))
+    return ticks
+
+
+async def rebuild_timers_index(redis: Redis) -> int:
+    """Index and upgrade timer hashes written by older releases."""
+    task_ids: List[int] = []
+    async for key in redis.scan_iter(match=f'{REDIS_ACTIVE_TIMER_PREFIX}*', count=500):
+        try:
+            task_ids.append(int(key.split(':')[-1]))
+        except ValueError:
+            continue
+    if not task_ids:
+        return 0
+    tasks = await Task.filter(id__in=task_ids).only('id', 'planned_seconds')
+    planned = {t.id: t.planned_seconds for t in tasks}
+    indexed = 0
+    for task_id in task_ids:
+        raw = await redis.hgetall(_key(task_id))
+        data = _parse_timer(task_id, raw)
+        if not data or task_id not in planned:
+            continue
+        if 'started_ts' not in raw:
+            await redis.hdel(_key(task_id), 'started_at', 'last_update_at')
+            await _start(
+                redis,
+                task_id,
+                data.started_at,
+                data.accumulated_seconds,
+                planned[task_id],
+                data.chat_id,
+                data.message_id,
+            )
+            indexed += 1
+            continue
+        deadline = _deadline(data.started_at, planned[task_id], data.accumulated_seconds)
+        indexed += await redis.zadd(_index_key(partition_of(task_id)), {str(task_id): deadline}, nx=True)
+    return indexed
+
+
+def display_seconds(total: int, planned: int, config: TimersConfig, resumed: int = 0) -> int:
+    """Elapsed seconds to show: exact near start and end, stepped in between.
+
+    The head window and the steps count from the last start or resume
+    (`resumed` seconds accumulated by then, the value the handler shows), so
+    the shown time never goes below what was already on the screen.
+    """
+    since = total - resumed
+    if since < config.refresh_head_seconds or planned - total <= config.refresh_tail_seconds:
+        return total
+    step = max(config.refresh_step_seconds, 1)
+    return max(total - since % step, resumed + config.refresh_head_seconds - 1)
+
+
 def format_seconds(seconds: int) -> str:
     hours = seconds // 3600
     minutes = (seconds % 3600) // 60
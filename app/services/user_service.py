@@ -1,9 +1,24 @@
-from typing import Optional
+from dataclasses import dataclass
+from datetime import date
+from typing import AsyncIterator, List, Optional, Sequence
+
+from tortoise.expressions import Subquery
 
 from app.core.config import Settings
+from app.db.models.task import Task
 from app.db.models.user import User
 
 
+USERS_BATCH_SIZE = 1000
+
+
+@dataclass
+class UserRef:
+    id: int
+    telegram_id: int
+    timezone: str
+
+
 async def get_or_create_user(telegram_id: int, settings: Settings) -> User:
     """Get user by telegram id or create new."""
     user = await User.get_or_none(telegram_id=telegram_id)
@@ -23,3 +38,46 @@ async def update_timezone(user: User, timezone: str) -> User:
 async def get_user_by_id(user_id: int) -> Optional[User]:
     """Get user by internal id."""
     return await User.get_or_none(id=user_id)
+
+
+async def list_user_timezones() -> List[str]:
+    """Distinct timezones of all users."""
+    return await User.all().distinct().values_list('timezone', flat=True)
+
+
+async def iter_user_batches(
+    timezones: Optional[Sequence[str]] = None,
+    active_since: Optional[date] = None,
+    batch_size: int = USERS_BATCH_SIZE,
+) -> AsyncIterator[List[UserRef]]:
+    """Users in id order, one keyset-paginated query per batch.
+
+    Filters by timezone and, with active_since, to users having tasks on or
+    after that date. Memory does not grow with the table and the first batch
+    is available right away.
+    """
+    last_id = 0
+    while True:
+        query = User.filter(id__gt=last_id)
+        if timezones is not None:
+            query = query.filter(timezone__in=list(timezones))
+        if active_since is not None:
+            query = query.filter(id__in=Subquery(Task.filter(date__gte=active_since).values('user_id')))
+        rows = await query.order_by('id').limit(batch_size).values('id', 'telegram_id', 'timezone')
+        if not rows:
+            return
+        yield [UserRef(**row) for row in rows]
+        if len(rows) < batch_size:
+            return
+        last_id = rows[-1]['id']
+
+
+async def iter_users(
+    timezones: Optional[Sequence[str]] = None,
+    active_since: Optional[date] = None,
+    batch_size: int = USERS_BATCH_SIZE,
+) -> AsyncIterator[UserRef]:
+    """Same as iter_user_batches, one user at a time."""
+    async for batch in iter_user_batches(timezones, active_since, batch_size):
+        for user in batch:
+            yield user
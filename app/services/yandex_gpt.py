@@ -0,0 +1,333 @@
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+import httpx
+from redis.asyncio import Redis
+
+from app.core.config import Settings, YandexGPTConfig
+from app.core.constants import APP_NAME
+from app.core.http import HttpStats, RequestTrace, create_http_client
+from app.core.logger import get_logger
+from app.services.ai_prompts import SYSTEM_PROMPT
+from app.services.completion_cache import CompletionCache, completion_key
+
+
+logger = get_logger('yandex_gpt')
+
+DEFAULT_MODEL = 'yandexgpt-lite'
+DEFAULT_TEMPERATURE = 0.3
+DEFAULT_MAX_TOKENS = 800
+# ответ дописан до конца: у частичного, обрезанного или отфильтрованного другой статус
+ALTERNATIVE_STATUS_FINAL = 'ALTERNATIVE_STATUS_FINAL'
+
+
+class CompletionError(Exception):
+    """The completion API did not answer; status is None for network errors."""
+
+    def __init__(self, message: str, status: Optional[int] = None) -> None:
+        super().__init__(message)
+        self.status = status
+
+    @property
+    def retryable(self) -> bool:
+        return self.status is None or self.status == 429 or self.status >= 500
+
+
+class OperationFailed(CompletionError):
+    """A deferred completion operation is lost or ended with an error; submitting it again may help."""
+
+
+class YandexGPTClient:
+    """Yandex GPT completion API over one pooled keep-alive HTTP client.
+
+    Created once per process (bot, cron worker) and closed on shutdown. With a
+    cache, identical requests are answered from Redis without calling the API.
+    At most endpoint_concurrency requests go to one endpoint at a time.
+    """
+
+    def __init__(self, config: YandexGPTConfig, cache: Optional[CompletionCache] = None) -> None:
+        self.config = config
+        self.cache = cache
+        self.stats = HttpStats()
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+        self._http = create_http_client(
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_keepalive_connections,
+            keepalive_seconds=config.keepalive_seconds,
+            connect_timeout_seconds=config.connect_timeout_seconds,
+            timeout_seconds=config.timeout_seconds,
+            http2=config.http2,
+        )
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {
+            'Authorization': f'Api-Key {self.config.api_key}',
+            'Content-Type': 'application/json',
+            'X-Client-Request-ID': APP_NAME,
+        }
+
+    def model_uri(self, model: str = DEFAULT_MODEL) -> str:
+        return f'gpt://{self.config.folder_id}/{model}'
+
+    def build_body(
+        self,
+        prompt: str,
+        temperature: float = DEFAULT_TEMPERATURE,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        model: str = DEFAULT_MODEL,
+    ) -> Dict[str, Any]:
+        return {
+            'modelUri': self.model_uri(model),
+            'completionOptions': {
+                'stream': False,
+                'temperature': temperature,
+                'maxTokens': max_tokens,
+            },
+            'messages': [
+                {
+                    'role': 'system',
+                    'text': SYSTEM_PROMPT,
+                },
+                {
+                    'role': 'user',
+                    'text': prompt,
+                },
+            ],
+        }
+
+    def _slot(self, url: str) -> asyncio.Semaphore:
+        slot = self._slots.get(url)
+        if slot is None:
+            slot = self._slots[url] = asyncio.Semaphore(max(self.config.endpoint_concurrency, 1))
+        return slot
+
+    async def send(
+        self,
+        method: str,
+        url: str,
+        body: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+        slot: Optional[str] = None,
+    ) -> httpx.Response:
+        """One API request; slot names the concurrency limit, the url by default."""
+        async with self._slot(slot or url):
+            started = time.monotonic()
+            trace = RequestTrace()
+            self.stats.requests += 1
+            try:
+                return await self._http.request(
+                    method,
+                    url,
+                    headers=self.headers,
+                    json=body,
+                    timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+                    extensions=trace.extensions,
+                )
+            except httpx.HTTPError:
+                self.stats.failures += 1
+                raise
+            finally:
+                trace.record(self.stats)
+                self.stats.seconds += time.monotonic() - started
+
+    async def post(self, url: str, body: Dict[str, Any], timeout: Optional[float] = None) -> httpx.Response:
+        return await self.send('POST', url, body, timeout)
+
+    def completion_key(
+        self,
+        prompt: str,
+        temperature: float = DEFAULT_TEMPERATURE,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+    ) -> str:
+        return completion_key(self.build_body(prompt, temperature, max_tokens))
+
+    async def cached_completion(
+        self,
+        prompt: str,
+        temperature: float = DEFAULT_TEMPERATURE,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+    ) -> Optional[str]:
+        if not self.cache:
+            return None
+        return await self.cache.get(self.completion_key(prompt, temperature, max_tokens))
+
+    async def request_completion(
+        self,
+        prompt: str,
+        temperature: float = DEFAULT_TEMPERATURE,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        timeout: Optional[float] = None,
+    ) -> Optional[str]:
+        """Text of the first alternative; raises CompletionError when the API did not answer."""
+        body = self.build_body(prompt, temperature, max_tokens)
+        key = completion_key(body)
+        if self.cache:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                return cached
+        try:
+            response = await self.post(self.config.endpoint, body, timeout)
+        except httpx.HTTPError as exc:
+            raise CompletionError(f'{type(exc).__name__}: {exc}') from exc
+        if response.status_code != 200:
+            self.stats.failures += 1
+            raise CompletionError(f'status {response.status_code}', response.status_code)
+        text, status = parse_completion(response.json())
+        if text and status == ALTERNATIVE_STATUS_FINAL and self.cache:
+            await self.cache.put(key, text)
+        return text
+
+    async def complete(
+        self,
+        prompt: str,
+        temperature: float = DEFAULT_TEMPERATURE,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        timeout: Optional[float] = None,
+    ) -> Optional[str]:
+        """Text of the first alternative, None when the API did not answer."""
+        try:
+            return await self.request_completion(prompt, temperature, max_tokens, timeout)
+        except CompletionError as exc:
+            logger.error('completion request error: %s', exc)
+            return None
+
+    async def submit_completion(
+        self,
+        prompt: str,
+        temperature: float = DEFAULT_TEMPERATURE,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+    ) -> str:
+        """Start a deferred completion, returns the operation id.
+
+        The asynchronous API is cheaper and has its own quota; the answer is
+        collected later with `get_operation`.
+        """
+        body = self.build_body(prompt, temperature, max_tokens)
+        try:
+            response = await self.post(self.config.async_endpoint, body)
+        except httpx.HTTPError as exc:
+            raise CompletionError(f'{type(exc).__name__}: {exc}') from exc
+        if response.status_code != 200:
+            self.stats.failures += 1
+            raise CompletionError(f'status {response.status_code}', response.status_code)
+        return response.json()['id']
+
+    async def get_operation(self, operation_id: str, cache_key: Optional[str] = None) -> Tuple[bool, Optional[str]]:
+        """(done, text) of a deferred completion; a finished answer is cached under cache_key.
+
+        Raises CompletionError when the request failed and OperationFailed when
+        the operation is unknown or ended with an error.
+        """
+        url = f'{self.config.operations_endpoint.rstrip("/")}/{operation_id}'
+        try:
+            response = await self.send('GET', url, slot=self.config.operations_endpoint)
+        except httpx.HTTPError as exc:
+            raise CompletionError(f'{type(exc).__name__}: {exc}') from exc
+        if response.status_code == 404:
+            raise OperationFailed(f'operation {operation_id} not found')
+        if response.status_code != 200:
+            self.stats.failures += 1
+            raise CompletionError(f'status {response.status_code}', response.status_code)
+        data = response.json()
+        if not data.get('done'):
+            return False, None
+        if data.get('error'):
+            error = data['error']
+            raise OperationFailed(f'operation {operation_id} failed: {error.get("code")} {error.get("message")}')
+        text, status = parse_completion({'result': data.get('response') or {}})
+        if text and status == ALTERNATIVE_STATUS_FINAL and cache_key and self.cache:
+            await self.cache.put(cache_key, text)
+        return True, text
+
+    async def stream(
+        self,
+        prompt: str,
+        temperature: float = DEFAULT_TEMPERATURE,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[str]:
+        """Streaming completion: yields the answer text so far as it grows.
+
+        The API sends one JSON object per line, each with the whole text
+        generated up to that moment. A cached answer is yielded at once; the
+        final text is cached under the same key as `complete` uses. Raises
+        CompletionError when the request fails or the stream breaks off or
+        ends without a final chunk, also after some text was yielded: that
+        text is not the answer.
+        """
+        body = self.build_body(prompt, temperature, max_tokens)
+        key = completion_key(body)
+        if self.cache:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+        body['completionOptions']['stream'] = True
+        started = time.monotonic()
+        trace = RequestTrace()
+        self.stats.requests += 1
+        text: Optional[str] = None
+        status: Optional[str] = None
+        try:
+            async with self._slot(self.config.endpoint), self._http.stream(
+                'POST',
+                self.config.endpoint,
+                headers=self.headers,
+                json=body,
+                timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+                extensions=trace.extensions,
+            ) as response:
+                if response.status_code != 200:
+                    self.stats.failures += 1
+                    logger.error('completion stream status %s', response.status_code)
+                    raise CompletionError(f'status {response.status_code}', response.status_code)
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    chunk, status = parse_completion(json.loads(line))
+                    if chunk and chunk != text:
+                        text = chunk
+                        yield text
+        except (httpx.HTTPError, ValueError) as exc:
+            self.stats.failures += 1
+            logger.error('completion stream error after %s chars: %s', len(text or ''), exc)
+            raise CompletionError(f'{type(exc).__name__}: {exc}') from exc
+        finally:
+            trace.record(self.stats)
+            self.stats.seconds += time.monotonic() - started
+        if status != ALTERNATIVE_STATUS_FINAL:
+            # поток закрылся до конца ответа или ответ отфильтрован — кешировать нечего
+            self.stats.failures += 1
+            logger.error('completion stream ended with status %s after %s chars', status, len(text or ''))
+            raise CompletionError(f'stream ended with status {status}')
+        if text and self.cache:
+            await self.cache.put(key, text)
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+
+def parse_completion(data: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+    """(text, status) of the first alternative."""
+    alternatives = data.get('result', {}).get('alternatives') or []
+    if not alternatives:
+        return None, None
+    first = alternatives[0]
+    message = first.get('message') or {}
+    return message.get('text'), first.get('status')
+
+
+def create_gpt_client(settings: Settings, redis: Redis) -> YandexGPTClient:
+    config = settings.yandex_gpt
+    cache = None
+    if config.cache_ttl_seconds > 0:
+        cache = CompletionCache(
+            redis,
+            ttl_seconds=config.cache_ttl_seconds,
+            max_entries=config.cache_max_entries,
+            max_bytes=config.cache_max_bytes,
+        )
+    return YandexGPTClient(config, cache)
@@ -1,158 +1,504 @@
 import asyncio
-from datetime import date, datetime, time, timedelta, timezone
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from functools import partial
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, TypeVar, Union
 
 from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from redis.asyncio import Redis
 
+from app.core.broadcast import broadcast
+from app.core.circuit_breaker import CircuitBreaker
 from app.core.config import Settings, get_settings
+from app.core.constants import REDIS_CRON_LEADER_KEY
+from app.core.job_queue import PermanentJobError, QueueJob, RedisJobQueue, RescheduleJob
+from app.core.leases import RedisLease
 from app.core.logger import get_logger
+from app.core.rate_limit import TokenBucket
+from app.core.redis import create_redis
+from app.core.scheduler import IntervalTrigger, Scheduler, ZonedCronTrigger
+from app.core.timezones import get_zone, local_date
 from app.db.init import close_db, init_db
-from app.db.models.user import User
-from app.services.ai_service import generate_daily_summary, generate_weekly_report
-from app.services.stats_service import get_daily_stats
-from app.services.tasks_service import list_active_or_planned_for_today
+from app.services.ai_jobs import (
+    AI_JOB_DAILY_PRECOMPUTE,
+    AI_JOB_DAILY_SUMMARY,
+    AI_JOB_ON_DEMAND,
+    AI_JOB_WEEKLY_REPORT,
+    create_ai_breaker,
+    create_ai_queue,
+    enqueue_precompute,
+    enqueue_summary,
+    generate_job_text,
+)
+from app.services.tasks_service import UserPendingTasks, iter_idle_day_users, iter_pending_tasks
+from app.services.yandex_gpt import YandexGPTClient, create_gpt_client
+from app.services.user_service import UserRef, iter_user_batches, iter_users, list_user_timezones
 from app.services.backlog_service import cleanup_old_tasks
+from app.services.cron_ledger_service import (
+    ClaimResult,
+    claim_delivery,
+    cleanup_deliveries,
+    get_last_run,
+    mark_delivered,
+    release_delivery,
+    set_last_run,
+)
+from app.bot.keyboards.ai import ai_menu_keyboard
 from app.bot.keyboards.tasks import tasks_list_keyboard
 
 
 logger = get_logger('cron_worker')
 
+T = TypeVar('T')
+
+TIMEZONES_REFRESH_SECONDS = 15 * 60
+CLEANUP_INTERVAL_SECONDS = 24 * 60 * 60
+REPORT_SECONDS = 10 * 60
+
+LEADER_JOBS = (
+    'daily_summary',
+    'daily_precompute',
+    'weekly_report',
+    'morning_plan',
+    'reminders',
+    'timezones',
+    'cleanup',
+)
+
+
+@dataclass
+class CronContext:
+    bot: Bot
+    redis: Redis
+    settings: Settings
+    # общий лимит отправки на весь процесс, чтобы параллельные рассылки не упирались в флуд-контроль
+    send_limiter: TokenBucket
+    leader: RedisLease
+    gpt: YandexGPTClient
+    # генерация ИИ идёт через очередь: потребители есть у каждой реплики, не только у лидера
+    ai_queue: RedisJobQueue
+    ai_breaker: CircuitBreaker
+    scheduler: Scheduler = field(default_factory=Scheduler)
+    # триггеры локальных рассылок по имени задачи, пояса в них обновляет задача timezones
+    triggers: Dict[str, ZonedCronTrigger] = field(default_factory=dict)
+    # рассылки идут только у реплики, которая держит аренду лидера
+    leading: asyncio.Event = field(default_factory=asyncio.Event)
+    # растёт при каждом новом захвате аренды — так видно, что лидерство прерывалось
+    term: int = 0
+
+
+# job(ctx, timezones, local_date) — рассылка для пользователей из этих часовых поясов
+LocalJob = Callable[[CronContext, List[str], date], Awaitable[None]]
+
+
+async def _send_message(ctx: CronContext, chat_id: int, text: str, **kwargs: Any) -> None:
+    await ctx.send_limiter.acquire()
+    try:
+        await ctx.bot.send_message(chat_id, text, **kwargs)
+    except TelegramRetryAfter as exc:
+        ctx.send_limiter.block_for(exc.retry_after)
+        await asyncio.sleep(exc.retry_after)
+        await ctx.send_limiter.acquire()
+        await ctx.bot.send_message(chat_id, text, **kwargs)
+
+
+async def _deliver_claimed(
+    job: str,
+    user_id: int,
+    period: str,
+    send: Callable[[], Awaitable[bool]],
+    stale_seconds: float,
+) -> Optional[bool]:
+    """Send once per (job, user, period): True if sent now, None if another run holds the claim."""
+    claim = await claim_delivery(job, user_id, period, stale_seconds)
+    if claim.result == ClaimResult.BUSY:
+        return None
+    if claim.result == ClaimResult.DELIVERED:
+        return False
+    try:
+        sent = await send()
+    except Exception:
+        await release_delivery(job, user_id, period, claim.token)
+        raise
+    if not sent:
+        await release_delivery(job, user_id, period, claim.token)
+        return False
+    if not await mark_delivered(job, user_id, period, claim.token):
+        logger.warning('%s claim for user %s period %s went stale before it was sent', job, user_id, period)
+    return True
+
+
+async def _deliver_once(
+    ctx: CronContext,
+    job: str,
+    user_id: int,
+    period: str,
+    send: Callable[[], Awaitable[bool]],
+) -> Optional[bool]:
+    if not ctx.leading.is_set():
+        return False
+    return await _deliver_claimed(job, user_id, period, send, ctx.settings.cron.delivery_claim_seconds)
+
+
+async def _broadcast_deliveries(
+    ctx: CronContext,
+    name: str,
+    items: Union[Iterable[T], AsyncIterable[T]],
+    deliver: Callable[[T], Awaitable[Optional[bool]]],
+) -> None:
+    """Broadcast deliver over items; recipients another run holds a claim for are retried in a later pass."""
+    while True:
+        busy: List[T] = []
 
-async def _send_daily_summaries(bot: Bot, settings: Settings) -> None:
-    today = date.today()
-    users = await User.all()
-    for user in users:
-        text = await generate_daily_summary(user.id, today, settings)
-        if not text:
-            continue
-        await bot.send_message(user.telegram_id, text)
+        async def handle(item: T) -> bool:
+            sent = await deliver(item)
+            if sent is None:
+                busy.append(item)
+                return False
+            return sent
 
+        await broadcast(name, items, handle, ctx.settings.cron.broadcast_concurrency)
+        if not busy or not ctx.leading.is_set():
+            return
+        # получатели числятся за прошлым лидером, который упал до отправки, — ждём, пока заявки устареют,
+        # не занимая слоты рассылки
+        logger.info('%s: %s recipients claimed by another run, retrying later', name, len(busy))
+        await asyncio.sleep(ctx.settings.cron.delivery_claim_seconds)
+        items = busy
 
-async def _send_weekly_reports(bot: Bot, settings: Settings) -> None:
-    today = date.today()
-    start = today - timedelta(days=today.weekday())
-    users = await User.all()
-    for user in users:
-        text = await generate_weekly_report(user.id, start, settings)
-        if not text:
-            continue
-        await bot.send_message(user.telegram_id, text)
 
+async def _enqueue_summaries(ctx: CronContext, kind: str, timezones: List[str], day: date) -> None:
+    # сама генерация — в очереди ИИ; повторная постановка после догоняющего прогона отсеется журналом доставок
+    async def enqueue(user: UserRef) -> bool:
+        if not ctx.leading.is_set():
+            return False
+        await enqueue_summary(ctx.ai_queue, kind, user.id, user.telegram_id, day)
+        return True
 
-async def _send_two_hour_reminders(bot: Bot) -> None:
-    today = date.today()
-    users = await User.all()
-    for user in users:
-        stats = await get_daily_stats(user, today)
-        remaining = [t for t in stats.tasks if t.status != 'completed']
-        if not remaining:
-            continue
-        lines = ['📅 Осталось на сегодня:']
-        for t in remaining:
-            lines.append(f'- {t.title}')
-        await bot.send_message(user.telegram_id, '\n'.join(lines))
+    await broadcast(kind, iter_users(timezones), enqueue, ctx.settings.cron.broadcast_concurrency)
 
 
-async def _sleep_until(target: datetime) -> None:
-    while True:
-        now = datetime.now(timezone.utc)
-        delta = (target - now).total_seconds()
-        if delta <= 0:
-            break
-        await asyncio.sleep(min(delta, 60))
+async def _send_daily_summaries(ctx: CronContext, timezones: List[str], day: date) -> None:
+    await _enqueue_summaries(ctx, AI_JOB_DAILY_SUMMARY, timezones, day)
 
 
-def _today_utc_at(hour: int, minute: int) -> datetime:
-    today = datetime.now(timezone.utc).date()
-    return datetime.combine(today, time(hour=hour, minute=minute, tzinfo=timezone.utc))
+async def _precompute_daily_summaries(ctx: CronContext, timezones: List[str], day: date) -> None:
+    """Generate daily summaries ahead of delivery for users whose day looks finished.
 
+    The answer lands in the completion cache under the hash of the prompt, which
+    is built from the day's stats. At delivery time an unchanged day produces
+    the same prompt and is served from the cache; a day that changed since then
+    misses and is generated as usual.
+    """
+    cron = ctx.settings.cron
+    # прогон попал на предыдущие локальные сутки, например рассылка в 00:30 и запас в час
+    if cron.daily_hour * 60 + cron.daily_minute < cron.precompute_lead_minutes:
+        day += timedelta(days=1)
+    deliver_at = datetime.combine(day, dt_time(cron.daily_hour, cron.daily_minute), tzinfo=get_zone(timezones[0]))
+    if deliver_at <= datetime.now(timezone.utc):
+        return
 
-async def daily_loop(bot: Bot, settings: Settings) -> None:
-    while True:
-        target = _today_utc_at(settings.cron.daily_hour, settings.cron.daily_minute)
-        await _sleep_until(target)
-        try:
-            await _send_daily_summaries(bot, settings)
-        except Exception as exc:
-            logger.error('daily summary error: %s', exc)
-        await asyncio.sleep(3600)
+    async def enqueue(user: UserRef) -> bool:
+        if not ctx.leading.is_set():
+            return False
+        await enqueue_precompute(ctx.ai_queue, user.id, day, deliver_at)
+        return True
 
+    await broadcast(
+        'daily_precompute',
+        iter_idle_day_users(iter_user_batches(timezones), day),
+        enqueue,
+        cron.broadcast_concurrency,
+    )
 
-async def weekly_loop(bot: Bot, settings: Settings) -> None:
-    while True:
-        now = datetime.now(timezone.utc)
-        if now.weekday() == settings.cron.weekly_weekday and now.hour == settings.cron.weekly_hour:
-            try:
-                await _send_weekly_reports(bot, settings)
-            except Exception as exc:
-                logger.error('weekly report error: %s', exc)
-            await asyncio.sleep(3600)
-        await asyncio.sleep(600)
 
+async def _send_weekly_reports(ctx: CronContext, timezones: List[str], day: date) -> None:
+    start = day - timedelta(days=day.weekday())
+    await _enqueue_summaries(ctx, AI_JOB_WEEKLY_REPORT, timezones, start)
 
-async def reminders_loop(bot: Bot, settings: Settings) -> None:
-    while True:
-        try:
-            await _send_two_hour_reminders(bot)
-        except Exception as exc:
-            logger.error('reminders error: %s', exc)
-        await asyncio.sleep(settings.cron.reminders_interval_hours * 60 * 60)
 
+def _is_deferred(ctx: CronContext, job: QueueJob) -> bool:
+    return job.kind in ctx.settings.ai_queue.deferred_kinds
 
-async def _send_morning_plan(bot: Bot) -> None:
-    today = date.today()
-    users = await User.all()
-    for user in users:
-        tasks = await list_active_or_planned_for_today(user, today)
-        if not tasks:
-            continue
-        lines = ['📅 План на сегодня:']
-        for idx, t in enumerate(tasks, start=1):
-            lines.append(f'{idx}. {t.title} — {t.planned_seconds // 60} мин')
-        await bot.send_message(user.telegram_id, '\n'.join(lines), reply_markup=tasks_list_keyboard(tasks))
 
+async def _deliver_ai_summary(ctx: CronContext, job: QueueJob) -> None:
+    payload = job.payload
+
+    async def send() -> bool:
+        # отложенная задача между опросами операции отпускает запись в журнале и берёт её снова
+        text = await generate_job_text(job, ctx.gpt, deferred=_is_deferred(ctx, job))
+        if not text:
+            return False
+        await _send_message(ctx, payload['telegram_id'], text)
+        return True
+
+    # задачу упавшего потребителя очередь отдаёт повторно через claim_idle_seconds — к этому времени
+    # его заявка в журнале уже должна считаться брошенной
+    stale_seconds = min(ctx.settings.cron.delivery_claim_seconds, ctx.settings.ai_queue.claim_idle_seconds)
+    sent = await _deliver_claimed(job.kind, payload['user_id'], payload['date'], send, stale_seconds)
+    if sent is None:
+        # доставку держит другой потребитель: вернёмся, когда он отправит или его заявка устареет
+        raise RescheduleJob(stale_seconds)
 
-async def morning_loop(bot: Bot, settings: Settings) -> None:
-    while True:
-        target = _today_utc_at(settings.cron.morning_hour, settings.cron.morning_minute)
-        await _sleep_until(target)
-        try:
-            await _send_morning_plan(bot)
-        except Exception as exc:
-            logger.error('morning plan error: %s', exc)
-        await asyncio.sleep(3600)
 
+async def _precompute_summary(ctx: CronContext, job: QueueJob) -> None:
+    # не успели до рассылки — саммари сгенерирует сама рассылка
+    if time.time() >= job.payload['deliver_at']:
+        return
+    await generate_job_text(job, ctx.gpt, deferred=_is_deferred(ctx, job))
 
-async def _cleanup_loop() -> None:
+
+async def _answer_on_demand(ctx: CronContext, job: QueueJob) -> None:
+    payload = job.payload
+    try:
+        text = await generate_job_text(job, ctx.gpt)
+    except PermanentJobError:
+        text = None
+    except Exception:
+        if not ctx.ai_queue.is_last_attempt(job):
+            raise
+        text = None
+    await ctx.bot.edit_message_text(
+        text or 'Пока не получилось собрать ответ, попробуйте позже.',
+        chat_id=payload['chat_id'],
+        message_id=payload['message_id'],
+        reply_markup=ai_menu_keyboard(),
+    )
+
+
+async def _handle_ai_job(ctx: CronContext, job: QueueJob) -> None:
+    try:
+        if job.kind == AI_JOB_ON_DEMAND:
+            await _answer_on_demand(ctx, job)
+        elif job.kind in (AI_JOB_DAILY_SUMMARY, AI_JOB_WEEKLY_REPORT):
+            await _deliver_ai_summary(ctx, job)
+        elif job.kind == AI_JOB_DAILY_PRECOMPUTE:
+            await _precompute_summary(ctx, job)
+        else:
+            raise PermanentJobError(f'unknown ai job kind {job.kind!r}')
+    except (TelegramForbiddenError, TelegramBadRequest) as exc:
+        # бот заблокирован или сообщение удалено — повтор ничего не даст
+        raise PermanentJobError(str(exc)) from exc
+
+
+def _reminder_slot(name: str, now: datetime, interval_hours: int) -> Tuple[date, str]:
+    local = now.astimezone(get_zone(name))
+    return local.date(), f'{local.date().isoformat()}/{local.hour // max(interval_hours, 1)}'
+
+
+async def _send_two_hour_reminders(ctx: CronContext, now: datetime) -> None:
+    # «сегодня» у каждого пользователя своё — собираем пояса по локальной дате и слоту
+    interval = ctx.settings.cron.reminders_interval_hours
+    zones_by_slot: Dict[Tuple[date, str], List[str]] = {}
+    for name in await list_user_timezones():
+        zones_by_slot.setdefault(_reminder_slot(name, now, interval), []).append(name)
+
+    for (day, period), zones in zones_by_slot.items():
+        async def deliver(pending: UserPendingTasks, period: str = period) -> Optional[bool]:
+            async def send() -> bool:
+                lines = ['📅 Осталось на сегодня:']
+                for t in pending.tasks:
+                    lines.append(f'- {t.title}')
+                await _send_message(ctx, pending.telegram_id, '\n'.join(lines))
+                return True
+
+            return await _deliver_once(ctx, 'reminders', pending.user_id, period, send)
+
+        await _broadcast_deliveries(ctx, 'reminders', iter_pending_tasks(iter_user_batches(zones), day), deliver)
+
+
+async def _send_morning_plan(ctx: CronContext, timezones: List[str], day: date) -> None:
+    async def deliver(pending: UserPendingTasks) -> Optional[bool]:
+        async def send() -> bool:
+            tasks = pending.tasks
+            lines = ['📅 План на сегодня:']
+            for idx, t in enumerate(tasks, start=1):
+                lines.append(f'{idx}. {t.title} — {t.planned_seconds // 60} мин')
+            await _send_message(ctx, pending.telegram_id, '\n'.join(lines), reply_markup=tasks_list_keyboard(tasks))
+            return True
+
+        return await _deliver_once(ctx, 'morning_plan', pending.user_id, day.isoformat(), send)
+
+    await _broadcast_deliveries(ctx, 'morning_plan', iter_pending_tasks(iter_user_batches(timezones), day), deliver)
+
+
+async def _cleanup(ctx: CronContext, run_at: datetime) -> None:
+    limit = run_at.date() - timedelta(days=30)
+    report = await cleanup_old_tasks(
+        limit,
+        batch_size=ctx.settings.cron.cleanup_batch_size,
+        archive_dir=ctx.settings.cron.cleanup_archive_dir or None,
+    )
+    logger.info('cleanup tasks: %s', report.as_log())
+    await cleanup_deliveries(run_at - timedelta(days=30))
+
+
+def _local_jobs(ctx: CronContext) -> Dict[str, Tuple[str, LocalJob]]:
+    cron = ctx.settings.cron
+    # в cron воскресенье — 0, а в WEEKLY_REPORT_WEEKDAY (как в date.weekday) — 6
+    weekly_weekday = (cron.weekly_weekday + 1) % 7
+    jobs: Dict[str, Tuple[str, LocalJob]] = {
+        'daily_summary': (f'{cron.daily_minute} {cron.daily_hour} * * *', _send_daily_summaries),
+        'weekly_report': (f'0 {cron.weekly_hour} * * {weekly_weekday}', _send_weekly_reports),
+        'morning_plan': (f'{cron.morning_minute} {cron.morning_hour} * * *', _send_morning_plan),
+    }
+    # без кеша ответов заранее сгенерированный текст негде хранить
+    if cron.precompute_lead_minutes > 0 and ctx.gpt.cache is not None:
+        hour, minute = divmod((cron.daily_hour * 60 + cron.daily_minute - cron.precompute_lead_minutes) % (24 * 60), 60)
+        jobs['daily_precompute'] = (f'{minute} {hour} * * *', _precompute_daily_summaries)
+    return jobs
+
+
+async def _run_local_job(ctx: CronContext, name: str, job: LocalJob, run_at: datetime) -> None:
+    trigger = ctx.triggers[name]
+    zones = trigger.zones_at(run_at)
+    if not zones:
+        return
+    if run_at < datetime.now(timezone.utc) - timedelta(minutes=1):
+        logger.info('%s catching up run at %s for %s', name, run_at.isoformat(), zones)
+    term = ctx.term
+    await job(ctx, zones, local_date(zones[0], run_at))
+    # если лидерство прерывалось, часть получателей могла быть пропущена — прогон повторится
+    if ctx.leading.is_set() and ctx.term == term:
+        await set_last_run(name, run_at)
+
+
+async def _resume_point(ctx: CronContext, name: str) -> datetime:
+    """Where a local-time job continues: its last finished run, at most catchup_hours back."""
+    now = datetime.now(timezone.utc)
+    last_run = await get_last_run(name)
+    oldest = now - timedelta(hours=ctx.settings.cron.catchup_hours)
+    return max(last_run or now, oldest)
+
+
+async def _refresh_timezones(ctx: CronContext) -> None:
+    zones = await list_user_timezones()
+    for name in _local_jobs(ctx):
+        ctx.triggers[name].set_zones(zones)
+        ctx.scheduler.reschedule(name, after=await _resume_point(ctx, name))
+
+
+async def _start_leader_jobs(ctx: CronContext) -> None:
+    """Register the jobs only the leader runs.
+
+    Local-time jobs fire per timezone bucket and replay every missed bucket
+    since their resume point, the interval ones just run once when late.
+    """
+    cron = ctx.settings.cron
+    zones = await list_user_timezones()
+    now = datetime.now(timezone.utc)
+    for name, (expression, job) in _local_jobs(ctx).items():
+        ctx.triggers[name] = ZonedCronTrigger(expression, zones)
+        ctx.scheduler.add_job(
+            name,
+            ctx.triggers[name],
+            partial(_run_local_job, ctx, name, job),
+            misfire_grace_seconds=cron.catchup_hours * 60 * 60,
+            coalesce=False,
+            start_after=await _resume_point(ctx, name),
+        )
+    reminders_interval = cron.reminders_interval_hours * 60 * 60
+    ctx.scheduler.add_job(
+        'reminders',
+        IntervalTrigger(reminders_interval),
+        partial(_send_two_hour_reminders, ctx),
+        jitter_seconds=30,
+        start_after=now - timedelta(seconds=reminders_interval),
+    )
+    ctx.scheduler.add_job(
+        'timezones',
+        IntervalTrigger(TIMEZONES_REFRESH_SECONDS),
+        lambda run_at: _refresh_timezones(ctx),
+    )
+    ctx.scheduler.add_job(
+        'cleanup',
+        IntervalTrigger(CLEANUP_INTERVAL_SECONDS),
+        partial(_cleanup, ctx),
+        jitter_seconds=300,
+        start_after=now - timedelta(seconds=CLEANUP_INTERVAL_SECONDS),
+    )
+
+
+def _stop_leader_jobs(ctx: CronContext) -> None:
+    for name in LEADER_JOBS:
+        ctx.scheduler.remove_job(name)
+    ctx.triggers.clear()
+
+
+async def _report(ctx: CronContext) -> None:
+    logger.info('cron jobs: %s', ctx.scheduler.report())
+    logger.info('yandex gpt http: %s', ctx.gpt.stats.as_log())
+    if ctx.gpt.cache:
+        logger.info('yandex gpt cache: %s', ctx.gpt.cache.stats.as_log())
+    logger.info('ai queue: %s breaker: %s', await ctx.ai_queue.report(), ctx.ai_breaker.as_log())
+
+
+async def _leader_loop(ctx: CronContext) -> None:
+    interval = ctx.settings.cron.leader_ttl_seconds / 3
     while True:
         try:
-            today = date.today()
-            limit = today - timedelta(days=30)
-            await cleanup_old_tasks(limit)
+            leading = await ctx.leader.acquire_or_renew()
         except Exception as exc:
-            logger.error('cleanup error: %s', exc)
-        await asyncio.sleep(24 * 60 * 60)
+            logger.error('cron leader lease error: %s', exc)
+            leading = False
+        if leading and not ctx.leading.is_set():
+            ctx.term += 1
+            ctx.leading.set()
+            try:
+                await _start_leader_jobs(ctx)
+                logger.info('cron leadership acquired by %s', ctx.leader.owner)
+            except Exception as exc:
+                # попробуем снова на следующем продлении аренды
+                logger.error('cron jobs start error: %s', exc)
+                ctx.leading.clear()
+                _stop_leader_jobs(ctx)
+        elif not leading and ctx.leading.is_set():
+            ctx.leading.clear()
+            _stop_leader_jobs(ctx)
+            logger.info('cron leadership lost by %s', ctx.leader.owner)
+        await asyncio.sleep(interval)
 
 
 async def main() -> None:
     settings: Settings = get_settings()
     await init_db(settings, with_schema=False)
+    redis = create_redis(settings)
     bot = Bot(token=settings.bot.token)
+    ctx = CronContext(
+        bot=bot,
+        redis=redis,
+        settings=settings,
+        send_limiter=TokenBucket(settings.telegram.global_rate, settings.telegram.global_rate),
+        leader=RedisLease(
+            redis,
+            REDIS_CRON_LEADER_KEY,
+            owner=settings.cron.worker_id,
+            ttl_seconds=settings.cron.leader_ttl_seconds,
+        ),
+        gpt=create_gpt_client(settings, redis),
+        ai_queue=create_ai_queue(settings, redis),
+        ai_breaker=create_ai_breaker(settings),
+    )
     try:
+        ctx.scheduler.add_job('report', IntervalTrigger(REPORT_SECONDS), lambda run_at: _report(ctx))
         await asyncio.gather(
-            daily_loop(bot, settings),
-            weekly_loop(bot, settings),
-            reminders_loop(bot, settings),
-            morning_loop(bot, settings),
-            _cleanup_loop(),
+            _leader_loop(ctx),
+            ctx.scheduler.run(),
+            ctx.ai_queue.run(partial(_handle_ai_job, ctx), settings.ai_queue.consumers, ctx.ai_breaker),
         )
     finally:
+        await ctx.scheduler.stop()
+        try:
+            await ctx.leader.release()
+        except Exception as exc:
+            logger.error('cron leader release error: %s', exc)
+        await ctx.gpt.aclose()
         await close_db()
+        await redis.close()
         await bot.session.close()
 
 
 if __name__ == '__main__':
     asyncio.run(main())
-
-
-
-
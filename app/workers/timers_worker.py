@@ -1,87 +1,272 @@
 import asyncio
+from dataclasses import dataclass, field
 from datetime import date, datetime, timezone
+import time
+from typing import Dict, List, Optional, Set
 
 from aiogram import Bot
 from redis.asyncio import Redis
 
+from app.bot.edit_scheduler import EditScheduler
+from app.bot.keyboards.cache import keyboard_cache_stats
 from app.bot.keyboards.tasks import timer_controls_keyboard, timer_finished_keyboard
+from app.core.cache import BoundedCache
 from app.core.config import Settings, get_settings
-from app.core.constants import REDIS_ACTIVE_TIMER_PREFIX
+from app.core.constants import (
+    REDIS_TASK_CHANGED_CHANNEL,
+    REDIS_TIMER_EVENTS_CHANNEL,
+    REDIS_TIMERS_WORKER_LEASES,
+    TIMER_PARTITIONS,
+)
+from app.core.deadlines import DeadlineQueue
+from app.core.leases import PartitionLeases
 from app.core.logger import get_logger
 from app.core.redis import create_redis
 from app.db.init import init_db, close_db
 from app.db.models.task import Task, TaskStatus
-from app.db.models.user import User
 from app.services.ai_service import generate_all_done_message
-from app.services.timers_service import _key, format_seconds, get_active_timer, stop_timer
+from app.services.timer_snapshot_service import delete_timer_snapshots, restore_timers, save_timer_snapshots
+from app.services.timers_service import (
+    TaskMeta,
+    TimerTick,
+    complete_timer,
+    display_seconds,
+    format_seconds,
+    get_timer_deadline,
+    list_running_timers,
+    load_task_meta,
+    parse_timer_event,
+    partition_of,
+    rebuild_timers_index,
+    tick_timers,
+)
 
 
 logger = get_logger('timers_worker')
 
+DEADLINES_RESYNC_SECONDS = 60
+REPORT_SECONDS = 60
 
-async def _process_timers(bot: Bot, redis: Redis, settings: Settings) -> None:
-    keys = await redis.keys(f'{REDIS_ACTIVE_TIMER_PREFIX}*')
-    if not keys:
+
+@dataclass
+class WorkerContext:
+    bot: Bot
+    redis: Redis
+    settings: Settings
+    leases: PartitionLeases
+    edits: EditScheduler
+    meta: BoundedCache[TaskMeta]
+    deadlines: DeadlineQueue = field(default_factory=DeadlineQueue)
+    # последний отправленный текст по task_id, чтобы не слать одинаковые правки
+    rendered: Dict[int, str] = field(default_factory=dict)
+    # результат последнего тика — из него же пишем снапшоты в БД
+    last_ticks: List[TimerTick] = field(default_factory=list)
+    last_tick_at: Optional[datetime] = None
+    snapshotted: Set[int] = field(default_factory=set)
+
+
+async def _get_task_meta(ctx: WorkerContext, task_ids: List[int]) -> Dict[int, TaskMeta]:
+    metas: Dict[int, TaskMeta] = {}
+    missing: List[int] = []
+    for task_id in task_ids:
+        meta = ctx.meta.get(task_id)
+        if meta is None:
+            missing.append(task_id)
+        else:
+            metas[task_id] = meta
+    if missing:
+        # задачу могли изменить, пока идёт запрос: тогда прочитанное в кеш не кладём
+        generation = ctx.meta.generation
+        loaded = await load_task_meta(missing)
+        for task_id, meta in loaded.items():
+            ctx.meta.put(task_id, meta, generation)
+        metas.update(loaded)
+    return metas
+
+
+async def _process_timers(ctx: WorkerContext) -> None:
+    partitions = set(ctx.leases.owned)
+    if not partitions:
         return
-    for key in keys:
-        raw = await redis.hgetall(key)
-        if not raw:
-            continue
-        task_id_str = key.split(':')[-1]
-        try:
-            task_id = int(task_id_str)
-        except ValueError:
-            continue
-        data = await get_active_timer(redis, task_id)
-        if not data:
+    now = datetime.now(timezone.utc)
+    ticks = await tick_timers(ctx.redis, now, partitions)
+    ctx.last_ticks = ticks
+    ctx.last_tick_at = now
+    if not ticks:
+        return
+    metas = await _get_task_meta(ctx, [t.task_id for t in ticks])
+    previous = ctx.rendered
+    ctx.rendered = {}
+    for data in ticks:
+        meta = metas.get(data.task_id)
+        if not meta:
             continue
-        now = datetime.now(timezone.utc)
-        delta = int((now - data.started_at).total_seconds())
-        if delta < 0:
+        if data.chat_id is None or data.message_id is None:
             continue
-        total = data.accumulated_seconds + delta
-        update_mapping = {
-            'accumulated_seconds': total,
-            'started_at': now.isoformat(),
-            'last_update_at': now.isoformat(),
-        }
-        await redis.hset(_key(task_id), mapping=update_mapping)
-        task = await Task.get_or_none(id=task_id)
-        if not task:
+        shown = display_seconds(data.total_seconds, meta.planned_seconds, ctx.settings.timers, data.resumed_seconds)
+        text = (
+            f'⏳ Задача: {meta.title}\n'
+            f'Прошло: {format_seconds(shown)}\n'
+            f'План: {format_seconds(meta.planned_seconds)}'
+        )
+        ctx.rendered[meta.task_id] = text
+        if previous.get(meta.task_id) == text:
             continue
-        if data.chat_id is not None and data.message_id is not None:
-            if not data.last_update_at or (now - data.last_update_at).total_seconds() >= 1:
-                text = (
-                    f'⏳ Задача: {task.title}\n'
-                    f'Прошло: {format_seconds(total)}\n'
-                    f'План: {format_seconds(task.planned_seconds)}'
-                )
-                try:
-                    await bot.edit_message_text(
-                        chat_id=data.chat_id,
-                        message_id=data.message_id,
-                        text=text,
-                        reply_markup=timer_controls_keyboard(task.id),
-                    )
-                except Exception as exc:
-                    logger.error(
-                        'edit_message_text error task_id=%s: %s', task.id, exc)
-        if total >= task.planned_seconds:
-            await stop_timer(redis, task, completed=True)
-            user = await User.get(id=task.user_id)
-            chat_id = user.telegram_id
-            text = (
-                f'⏰ Время вышло!\n'
-                f'Задача "{task.title}" завершена.\n'
-                f'Факт: {format_seconds(total)} из плана {format_seconds(task.planned_seconds)}.'
-            )
-            await bot.send_message(chat_id, text, reply_markup=timer_finished_keyboard(task.id))
-            today = date.today()
-            tasks_today = await Task.filter(user_id=user.id, date=today)
-            if tasks_today and all(t.status == TaskStatus.COMPLETED for t in tasks_today):
-                extra = await generate_all_done_message(user.id, today, settings)
-                if extra:
-                    await bot.send_message(chat_id, extra)
+        ctx.edits.submit(
+            meta.task_id,
+            chat_id=data.chat_id,
+            message_id=data.message_id,
+            text=text,
+            reply_markup=timer_controls_keyboard(meta.task_id),
+        )
+
+
+async def _complete_timer(ctx: WorkerContext, task_id: int) -> None:
+    if partition_of(task_id) not in ctx.leases.owned:
+        return
+    deadline = await get_timer_deadline(ctx.redis, task_id)
+    if deadline is None:
+        return
+    if deadline > time.time():
+        # план успели продлить, а событие ещё не дошло
+        ctx.deadlines.schedule(task_id, deadline)
+        return
+    task = await complete_timer(ctx.redis, task_id)
+    if not task:
+        # план продлили между проверкой и завершением — ждём новый дедлайн
+        deadline = await get_timer_deadline(ctx.redis, task_id)
+        if deadline is not None:
+            ctx.deadlines.schedule(task_id, deadline)
+        return
+    total = task.spent_seconds
+    ctx.edits.discard(task_id)
+    ctx.rendered.pop(task_id, None)
+    metas = await _get_task_meta(ctx, [task_id])
+    ctx.meta.pop(task_id)
+    chat_id = metas[task_id].telegram_id
+    text = (
+        f'⏰ Время вышло!\n'
+        f'Задача "{task.title}" завершена.\n'
+        f'Факт: {format_seconds(total)} из плана {format_seconds(task.planned_seconds)}.'
+    )
+    await ctx.edits.send_message(chat_id, text, reply_markup=timer_finished_keyboard(task.id))
+    today = date.today()
+    tasks_today = await Task.filter(user_id=task.user_id, date=today)
+    if tasks_today and all(t.status == TaskStatus.COMPLETED for t in tasks_today):
+        extra = await generate_all_done_message(task.user_id, today, ctx.settings)
+        if extra:
+            await ctx.edits.send_message(chat_id, extra)
+
+
+async def _on_deadline(ctx: WorkerContext, task_id: int) -> None:
+    try:
+        await _complete_timer(ctx, task_id)
+    except Exception as exc:
+        logger.error('timer completion error task_id=%s: %s', task_id, exc)
+
+
+async def _resync_deadlines(ctx: WorkerContext) -> None:
+    running = await list_running_timers(ctx.redis, set(ctx.leases.owned))
+    ctx.deadlines.clear()
+    for task_id, deadline in running:
+        ctx.deadlines.schedule(task_id, deadline)
+
+
+def _on_task_changed(ctx: WorkerContext, payload: str) -> None:
+    try:
+        ctx.meta.pop(int(payload))
+    except ValueError:
+        return
+
+
+async def _events_loop(ctx: WorkerContext) -> None:
+    while True:
+        pubsub = ctx.redis.pubsub()
+        try:
+            await pubsub.subscribe(REDIS_TIMER_EVENTS_CHANNEL, REDIS_TASK_CHANGED_CHANNEL)
+            # пока не были подписаны, события могли потеряться
+            ctx.meta.clear()
+            await _resync_deadlines(ctx)
+            async for message in pubsub.listen():
+                if message['type'] != 'message':
+                    continue
+                if message['channel'] == REDIS_TASK_CHANGED_CHANNEL:
+                    _on_task_changed(ctx, message['data'])
+                    continue
+                event = parse_timer_event(message['data'])
+                if not event or partition_of(event.task_id) not in ctx.leases.owned:
+                    continue
+                if event.deadline is None:
+                    ctx.deadlines.cancel(event.task_id)
+                    # таймер на паузе или завершён — устаревший «Прошло: ...» не должен затереть экран
+                    ctx.edits.discard(event.task_id)
+                    ctx.rendered.pop(event.task_id, None)
+                else:
+                    ctx.deadlines.schedule(event.task_id, event.deadline)
+        except Exception as exc:
+            logger.error('timer events error: %s', exc)
+        finally:
+            await pubsub.aclose()
+        await asyncio.sleep(1)
+
+
+async def _leases_loop(ctx: WorkerContext, interval: float) -> None:
+    last_resync = time.monotonic()
+    while True:
+        before = set(ctx.leases.owned)
+        try:
+            owned = await ctx.leases.heartbeat()
+        except Exception as exc:
+            logger.error('partition leases error: %s', exc)
+            # не можем подтвердить аренду — перестаём тикать, пока Redis не вернётся
+            ctx.leases.owned.clear()
+            owned = set()
+        try:
+            if owned != before or time.monotonic() - last_resync >= DEADLINES_RESYNC_SECONDS:
+                await _resync_deadlines(ctx)
+                last_resync = time.monotonic()
+        except Exception as exc:
+            logger.error('deadlines resync error: %s', exc)
+        if owned != before:
+            # общий лимит Telegram делится между репликами пропорционально их партициям
+            ctx.edits.set_global_share(max(len(owned), 1) / TIMER_PARTITIONS)
+            logger.info('timer partitions owned: %s', sorted(owned))
+        await asyncio.sleep(interval)
+
+
+async def _snapshot_timers(ctx: WorkerContext) -> None:
+    if ctx.last_tick_at is None:
+        return
+    owned = set(ctx.leases.owned)
+    ticks = [t for t in ctx.last_ticks if partition_of(t.task_id) in owned]
+    await save_timer_snapshots(ticks, ctx.last_tick_at)
+    current = {t.task_id for t in ticks}
+    # чужие после ребалансировки партиции не трогаем — их снапшоты пишет новый владелец
+    vanished = [task_id for task_id in ctx.snapshotted - current if partition_of(task_id) in owned]
+    await delete_timer_snapshots(vanished)
+    ctx.snapshotted = current
+
+
+async def _snapshot_loop(ctx: WorkerContext) -> None:
+    while True:
+        await asyncio.sleep(ctx.settings.timers.snapshot_seconds)
+        try:
+            await _snapshot_timers(ctx)
+        except Exception as exc:
+            logger.error('timers snapshot error: %s', exc)
+
+
+async def _report_loop(ctx: WorkerContext) -> None:
+    while True:
+        await asyncio.sleep(REPORT_SECONDS)
+        logger.info('timer edits: %s', ctx.edits.report())
+        logger.info(
+            'task meta cache: size=%s hits=%s misses=%s',
+            len(ctx.meta),
+            ctx.meta.hits,
+            ctx.meta.misses,
+        )
+        logger.info('keyboard cache: %s', keyboard_cache_stats())
 
 
 async def main() -> None:
@@ -89,14 +274,60 @@ async def main() -> None:
     await init_db(settings, with_schema=False)
     redis = create_redis(settings)
     bot = Bot(token=settings.bot.token)
+    restored = await restore_timers(redis)
+    if restored:
+        logger.info('timers restored from snapshots: %s', restored)
+    indexed = await rebuild_timers_index(redis)
+    if indexed:
+        logger.info('timers index rebuilt: %s timers added', indexed)
+    leases = PartitionLeases(
+        redis,
+        REDIS_TIMERS_WORKER_LEASES,
+        TIMER_PARTITIONS,
+        owner=settings.timers.worker_id,
+        ttl_seconds=settings.timers.lease_ttl_seconds,
+    )
+    ctx = WorkerContext(
+        bot=bot,
+        redis=redis,
+        settings=settings,
+        leases=leases,
+        edits=EditScheduler(bot, settings.telegram),
+        meta=BoundedCache(settings.timers.meta_cache_size),
+    )
+    background = [
+        asyncio.create_task(_leases_loop(ctx, settings.timers.lease_ttl_seconds / 3)),
+        asyncio.create_task(_events_loop(ctx)),
+        asyncio.create_task(ctx.deadlines.run(
+            lambda task_id: _on_deadline(ctx, task_id),
+            settings.timers.completion_concurrency,
+        )),
+        asyncio.create_task(ctx.edits.run()),
+        asyncio.create_task(_snapshot_loop(ctx)),
+        asyncio.create_task(_report_loop(ctx)),
+    ]
     try:
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
         while True:
             try:
-                await _process_timers(bot, redis, settings)
+                await _process_timers(ctx)
             except Exception as exc:
                 logger.error('timers loop error: %s', exc)
-            await asyncio.sleep(1)
+            next_tick += 1
+            delay = next_tick - loop.time()
+            if delay < 0:
+                logger.warning('timers tick overran by %.2fs', -delay)
+                next_tick = loop.time()
+                delay = 0
+            await asyncio.sleep(delay)
     finally:
+        for bg in background:
+            bg.cancel()
+        try:
+            await leases.release_all()
+        except Exception as exc:
+            logger.error('partition leases release error: %s', exc)
         await close_db()
         await redis.close()
         await bot.session.close()
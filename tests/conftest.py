@@ -0,0 +1,56 @@
+from collections.abc import AsyncIterator, Iterator
+from dataclasses import replace
+
+import fakeredis.aioredis
+import pytest
+from tortoise import Tortoise
+
+from app.core.config import YandexGPTConfig, get_settings
+from app.db.config import get_tortoise_config
+from tests.fake_yandex_gpt import FakeYandexGPT, serve
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    return 'asyncio'
+
+
+@pytest.fixture
+async def redis() -> AsyncIterator[fakeredis.aioredis.FakeRedis]:
+    client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    yield client
+    await client.aclose()
+
+
+@pytest.fixture
+async def db() -> AsyncIterator[None]:
+    config = get_tortoise_config(get_settings())
+    config['connections'] = {'default': 'sqlite://:memory:'}
+    await Tortoise.init(config=config)
+    await Tortoise.generate_schemas()
+    yield
+    await Tortoise.close_connections()
+
+
+@pytest.fixture
+def fake_api() -> FakeYandexGPT:
+    return FakeYandexGPT(latency_seconds=0.0, operation_seconds=0.2, fail_rate=0.0)
+
+
+@pytest.fixture
+def gpt_config(fake_api: FakeYandexGPT) -> Iterator[YandexGPTConfig]:
+    server = serve('127.0.0.1', 0, fake_api)
+    base = f'http://127.0.0.1:{server.server_address[1]}'
+    yield replace(
+        get_settings().yandex_gpt,
+        api_key='test-key',
+        folder_id='test-folder',
+        endpoint=f'{base}/foundationModels/v1/completion',
+        async_endpoint=f'{base}/foundationModels/v1/completionAsync',
+        operations_endpoint=f'{base}/operations',
+        poll_interval_seconds=0.05,
+        poll_max_rounds=3,
+        http2=False,
+    )
+    server.shutdown()
+    server.server_close()
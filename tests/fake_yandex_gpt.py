@@ -0,0 +1,172 @@
+"""Local stand-in for the Yandex GPT completion APIs.
+
+Serves the synchronous (optionally streaming) completion, completionAsync and
+the operations endpoint with canned answers, so the bot and the workers can
+run end to end without an API key:
+
+    python -m tests.fake_yandex_gpt --port 8090 --operation-seconds 15
+
+    YANDEX_GPT_ENDPOINT=http://localhost:8090/foundationModels/v1/completion
+    YANDEX_GPT_ASYNC_ENDPOINT=http://localhost:8090/foundationModels/v1/completionAsync
+    YANDEX_GPT_OPERATIONS_ENDPOINT=http://localhost:8090/operations
+"""
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+import uuid
+
+from app.core.logger import get_logger
+
+
+logger = get_logger('fake_yandex_gpt')
+
+COMPLETION_PATH = '/foundationModels/v1/completion'
+ASYNC_COMPLETION_PATH = '/foundationModels/v1/completionAsync'
+OPERATIONS_PATH = '/operations/'
+STREAM_CHUNKS = 5
+
+
+def _answer(body: Dict[str, Any]) -> str:
+    messages = body.get('messages') or []
+    prompt = messages[-1].get('text', '') if messages else ''
+    data = [line for line in prompt.splitlines() if line.startswith(('Дата:', 'Неделя:'))]
+    return f'Тестовый ответ ({data[0] if data else "без данных"}): день прошёл продуктивно, так держать.'
+
+
+def _result(text: str, final: bool = True) -> Dict[str, Any]:
+    return {
+        'alternatives': [
+            {
+                'message': {'role': 'assistant', 'text': text},
+                'status': 'ALTERNATIVE_STATUS_FINAL' if final else 'ALTERNATIVE_STATUS_PARTIAL',
+            },
+        ],
+        'usage': {'inputTextTokens': '0', 'completionTokens': '0', 'totalTokens': '0'},
+        'modelVersion': 'stand-in',
+    }
+
+
+class FakeYandexGPT:
+    def __init__(self, latency_seconds: float, operation_seconds: float, fail_rate: float) -> None:
+        self.latency_seconds = latency_seconds
+        self.operation_seconds = operation_seconds
+        self.fail_rate = fail_rate
+        # поток закрывается до последнего, финального чанка
+        self.stream_closes_early = False
+        # id операции → (время готовности, текст)
+        self.operations: Dict[str, Tuple[float, str]] = {}
+        self.lock = threading.Lock()
+
+    def should_fail(self) -> bool:
+        return random.random() < self.fail_rate
+
+    def create_operation(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        operation_id = uuid.uuid4().hex
+        with self.lock:
+            self.operations[operation_id] = (time.time() + self.operation_seconds, _answer(body))
+        return {'id': operation_id, 'description': 'Async GPT Completion', 'done': False}
+
+    def get_operation(self, operation_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            entry = self.operations.get(operation_id)
+        if entry is None:
+            return None
+        ready_at, text = entry
+        if time.time() < ready_at:
+            return {'id': operation_id, 'done': False}
+        return {'id': operation_id, 'done': True, 'response': _result(text)}
+
+
+def _handler(api: FakeYandexGPT) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        # keep-alive, как у настоящего API, — иначе пул соединений клиента не проверить
+        protocol_version = 'HTTP/1.1'
+
+        def _reply(self, status: int, data: Optional[Dict[str, Any]] = None) -> None:
+            payload = json.dumps(data or {}, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _stream(self, text: str) -> None:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            step = max(len(text) // STREAM_CHUNKS, 1)
+            ends = list(range(step, len(text), step))
+            if not api.stream_closes_early:
+                ends.append(len(text))
+            for end in ends:
+                line = json.dumps({'result': _result(text[:end], end == len(text))}, ensure_ascii=False)
+                self.wfile.write(line.encode('utf-8') + b'\n')
+                self.wfile.flush()
+                time.sleep(api.latency_seconds / STREAM_CHUNKS)
+            self.close_connection = True
+
+        def do_POST(self) -> None:
+            length = int(self.headers.get('Content-Length') or 0)
+            body = json.loads(self.rfile.read(length) or b'{}')
+            if api.should_fail():
+                self._reply(503, {'error': 'stand-in failure'})
+                return
+            if self.path == ASYNC_COMPLETION_PATH:
+                self._reply(200, api.create_operation(body))
+                return
+            if self.path != COMPLETION_PATH:
+                self._reply(404)
+                return
+            text = _answer(body)
+            if (body.get('completionOptions') or {}).get('stream'):
+                self._stream(text)
+                return
+            time.sleep(api.latency_seconds)
+            self._reply(200, {'result': _result(text)})
+
+        def do_GET(self) -> None:
+            if not self.path.startswith(OPERATIONS_PATH):
+                self._reply(404)
+                return
+            operation = api.get_operation(self.path[len(OPERATIONS_PATH):])
+            if operation is None:
+                self._reply(404)
+                return
+            self._reply(200, operation)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            logger.debug(format, *args)
+
+    return Handler
+
+
+def serve(host: str, port: int, api: FakeYandexGPT) -> ThreadingHTTPServer:
+    """Start the stand-in in a background thread; call shutdown() on the result to stop."""
+    server = ThreadingHTTPServer((host, port), _handler(api))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--latency-seconds', type=float, default=1.0, help='time to answer a synchronous request')
+    parser.add_argument('--operation-seconds', type=float, default=10.0, help='time until an async operation is done')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='share of POST requests answered with 503')
+    args = parser.parse_args()
+    api = FakeYandexGPT(args.latency_seconds, args.operation_seconds, args.fail_rate)
+    server = ThreadingHTTPServer((args.host, args.port), _handler(api))
+    logger.info('fake yandex gpt on http://%s:%s', args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info('fake yandex gpt stopped')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.circuit_breaker import CircuitBreaker
+from app.core.job_queue import QueueJob, RedisJobQueue, RescheduleJob
+from app.services import ai_jobs
+from app.services.ai_jobs import AI_JOB_WEEKLY_REPORT, generate_job_text
+from app.services.completion_cache import CompletionCache
+from app.services.yandex_gpt import OperationFailed, YandexGPTClient
+
+
+pytestmark = pytest.mark.anyio
+
+PROMPT = 'Неделя: 2026-10-12\nЗадач: 5, выполнено: 4'
+
+
+@pytest.fixture(autouse=True)
+def fixed_prompt(monkeypatch: pytest.MonkeyPatch) -> None:
+    async def build_job_prompt(job: QueueJob) -> str:
+        return PROMPT
+
+    monkeypatch.setattr(ai_jobs, 'build_job_prompt', build_job_prompt)
+
+
+@pytest.fixture
+async def gpt(gpt_config, redis):
+    client = YandexGPTClient(gpt_config, CompletionCache(redis, ttl_seconds=60, max_entries=100, max_bytes=16384))
+    yield client
+    await client.aclose()
+
+
+def _weekly_job() -> QueueJob:
+    return QueueJob(kind=AI_JOB_WEEKLY_REPORT, payload={'user_id': 1, 'date': '2026-10-12'})
+
+
+async def test_deferred_job_is_submitted_polled_and_cached(redis, gpt, fake_api):
+    queue = RedisJobQueue(
+        redis,
+        'test_ai',
+        consumer='test',
+        max_attempts=3,
+        backoff_base_seconds=0,
+        backoff_max_seconds=0,
+        claim_idle_seconds=60,
+        dead_letter_maxlen=100,
+    )
+    await queue.ensure_group()
+    breaker = CircuitBreaker(failure_ratio=0.5, window=10, min_calls=5, open_seconds=1)
+    answers = []
+
+    async def handler(job: QueueJob) -> None:
+        answers.append(await generate_job_text(job, gpt, deferred=True))
+
+    await queue.enqueue(AI_JOB_WEEKLY_REPORT, {'user_id': 1, 'date': '2026-10-12'})
+    deadline = time.monotonic() + 5
+    while not answers:
+        assert time.monotonic() < deadline, 'deferred job did not finish'
+        await queue._promote_due()
+        job = await queue._read('test:0')
+        if job is None:
+            await asyncio.sleep(0.02)
+            continue
+        await queue._process(job, handler, breaker)
+
+    assert answers[0].startswith('Тестовый ответ (Неделя: 2026-10-12)')
+    # отправка операции и хотя бы один опрос, пока она не готова
+    assert queue.stats.rescheduled >= 2
+    assert queue.stats.done == 1
+    assert queue.stats.retried == queue.stats.dead == 0
+    assert len(fake_api.operations) == 1
+    assert await gpt.cached_completion(PROMPT) == answers[0]
+    assert await queue.counts() == {'queued': 0, 'delayed': 0, 'dead': 0}
+
+
+async def test_cached_answer_skips_the_operation(gpt, fake_api):
+    await gpt.cache.put(gpt.completion_key(PROMPT), 'из кеша')
+
+    assert await generate_job_text(_weekly_job(), gpt, deferred=True) == 'из кеша'
+    assert not fake_api.operations
+
+
+async def test_deferred_job_gives_up_after_poll_max_rounds(gpt, fake_api):
+    fake_api.operation_seconds = 60
+    job = _weekly_job()
+    with pytest.raises(RescheduleJob):
+        await generate_job_text(job, gpt, deferred=True)
+    first_operation = job.payload['operation_id']
+
+    for _ in range(gpt.config.poll_max_rounds - 1):
+        with pytest.raises(RescheduleJob):
+            await generate_job_text(job, gpt, deferred=True)
+    with pytest.raises(OperationFailed) as failed:
+        await generate_job_text(job, gpt, deferred=True)
+
+    assert failed.value.retryable
+    assert 'operation_id' not in job.payload
+    # повтор задачи отправляет операцию заново
+    with pytest.raises(RescheduleJob):
+        await generate_job_text(job, gpt, deferred=True)
+    assert job.payload['operation_id'] != first_operation
+    assert job.payload['polls'] == 0
+
+
+async def test_lost_operation_is_submitted_again(gpt, fake_api):
+    job = _weekly_job()
+    with pytest.raises(RescheduleJob):
+        await generate_job_text(job, gpt, deferred=True)
+    fake_api.operations.clear()
+
+    with pytest.raises(OperationFailed):
+        await generate_job_text(job, gpt, deferred=True)
+    assert 'operation_id' not in job.payload
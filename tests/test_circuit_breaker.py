@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from app.core.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+pytestmark = pytest.mark.anyio
+
+
+def _breaker() -> CircuitBreaker:
+    return CircuitBreaker(failure_ratio=0.5, window=4, min_calls=4, open_seconds=0.05)
+
+
+async def test_opens_only_after_min_calls():
+    breaker = _breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.state == CLOSED
+
+    breaker.record_failure()
+
+    assert breaker.state == OPEN
+    assert breaker.opened == 1
+
+
+async def test_successes_keep_it_closed_below_failure_ratio():
+    breaker = _breaker()
+    for outcome in (True, True, True, False, True):
+        if outcome:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+async def test_half_open_lets_one_probe_through():
+    breaker = _breaker()
+    for _ in range(4):
+        breaker.record_failure()
+    await asyncio.sleep(0.06)
+    assert breaker.state == HALF_OPEN
+
+    await breaker.acquire()
+    waiting = asyncio.create_task(breaker.acquire())
+    await asyncio.sleep(0.05)
+    assert not waiting.done()
+
+    breaker.record_success()
+    await asyncio.wait_for(waiting, timeout=2)
+    assert breaker.state == CLOSED
+
+
+async def test_failed_probe_opens_it_again():
+    breaker = _breaker()
+    for _ in range(4):
+        breaker.record_failure()
+    await asyncio.sleep(0.06)
+    await breaker.acquire()
+
+    breaker.record_failure()
+
+    assert breaker.state == OPEN
+    assert breaker.opened == 2
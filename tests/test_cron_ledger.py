@@ -0,0 +1,105 @@
+import asyncio
+from dataclasses import replace
+from datetime import timedelta
+from types import SimpleNamespace
+from typing import List, Optional
+
+import pytest
+
+from app.core.config import get_settings
+
+from app.db.models.cron_delivery import CronDelivery, DeliveryStatus
+from app.db.models.user import User
+from app.services.cron_ledger_service import ClaimResult, claim_delivery, mark_delivered, release_delivery
+from app.workers.cron_worker import _broadcast_deliveries, _deliver_once
+
+
+pytestmark = pytest.mark.anyio
+
+JOB = 'morning_plan'
+PERIOD = '2026-10-18'
+STALE = 60
+
+
+async def _user() -> int:
+    user = await User.create(telegram_id=1, timezone='UTC')
+    return user.id
+
+
+async def _make_stale(user_id: int) -> None:
+    row = await CronDelivery.get(job=JOB, user_id=user_id, period=PERIOD)
+    row.claimed_at -= timedelta(seconds=STALE + 1)
+    await row.save(update_fields=['claimed_at'])
+
+
+async def test_second_claim_is_busy_until_the_first_is_sent(db):
+    user_id = await _user()
+    first = await claim_delivery(JOB, user_id, PERIOD, STALE)
+    assert first.result == ClaimResult.CLAIMED
+
+    assert (await claim_delivery(JOB, user_id, PERIOD, STALE)).result == ClaimResult.BUSY
+    assert await mark_delivered(JOB, user_id, PERIOD, first.token)
+    assert (await claim_delivery(JOB, user_id, PERIOD, STALE)).result == ClaimResult.DELIVERED
+
+
+async def test_stale_claim_is_taken_over(db):
+    user_id = await _user()
+    slow = await claim_delivery(JOB, user_id, PERIOD, STALE)
+    await _make_stale(user_id)
+
+    owner = await claim_delivery(JOB, user_id, PERIOD, STALE)
+
+    assert owner.result == ClaimResult.CLAIMED
+    assert owner.token != slow.token
+    # медленный прогон всё-таки отправил — отметка за новым владельцем
+    assert not await mark_delivered(JOB, user_id, PERIOD, slow.token)
+    assert await mark_delivered(JOB, user_id, PERIOD, owner.token)
+
+
+async def test_late_release_keeps_the_new_owner_claim(db):
+    user_id = await _user()
+    slow = await claim_delivery(JOB, user_id, PERIOD, STALE)
+    await _make_stale(user_id)
+    owner = await claim_delivery(JOB, user_id, PERIOD, STALE)
+
+    await release_delivery(JOB, user_id, PERIOD, slow.token)
+
+    assert (await claim_delivery(JOB, user_id, PERIOD, STALE)).result == ClaimResult.BUSY
+    await mark_delivered(JOB, user_id, PERIOD, owner.token)
+    await release_delivery(JOB, user_id, PERIOD, slow.token)
+    await release_delivery(JOB, user_id, PERIOD, owner.token)
+
+    row = await CronDelivery.get(job=JOB, user_id=user_id, period=PERIOD)
+    assert row.status == DeliveryStatus.SENT
+    assert (await claim_delivery(JOB, user_id, PERIOD, STALE)).result == ClaimResult.DELIVERED
+
+
+async def test_busy_recipients_are_retried_after_the_broadcast(db):
+    user_id = await _user()
+    slow = await claim_delivery(JOB, user_id, PERIOD, STALE)
+    settings = get_settings()
+    ctx = SimpleNamespace(
+        settings=replace(settings, cron=replace(settings.cron, delivery_claim_seconds=0.2, broadcast_concurrency=1)),
+        leading=asyncio.Event(),
+    )
+    ctx.leading.set()
+    sent: List[str] = []
+
+    async def deliver(name: str) -> Optional[bool]:
+        async def send() -> bool:
+            sent.append(name)
+            return True
+
+        target = user_id if name == 'busy' else (await User.create(telegram_id=len(sent) + 2, timezone='UTC')).id
+        return await _deliver_once(ctx, JOB, target, PERIOD, send)
+
+    async def first_pass_done() -> None:
+        # пока занятый получатель ждёт, остальные уже получили сообщение
+        await asyncio.sleep(0.1)
+        assert sent == ['free']
+        await _make_stale(user_id)
+
+    await asyncio.gather(_broadcast_deliveries(ctx, JOB, ['busy', 'free'], deliver), first_pass_done())
+
+    assert sent == ['free', 'busy']
+    assert not await mark_delivered(JOB, user_id, PERIOD, slow.token)
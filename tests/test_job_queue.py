@@ -0,0 +1,112 @@
+import json
+
+import pytest
+
+from app.core.circuit_breaker import CircuitBreaker
+from app.core.job_queue import PermanentJobError, QueueJob, RedisJobQueue, RescheduleJob
+
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def queue(redis) -> RedisJobQueue:
+    queue = RedisJobQueue(
+        redis,
+        'test_jobs',
+        consumer='test',
+        max_attempts=3,
+        backoff_base_seconds=0,
+        backoff_max_seconds=0,
+        claim_idle_seconds=0,
+        dead_letter_maxlen=100,
+    )
+    await queue.ensure_group()
+    return queue
+
+
+@pytest.fixture
+def breaker() -> CircuitBreaker:
+    return CircuitBreaker(failure_ratio=0.5, window=10, min_calls=100, open_seconds=1)
+
+
+async def _run_once(queue: RedisJobQueue, handler, breaker: CircuitBreaker) -> bool:
+    await queue._promote_due()
+    job = await queue._read('test:0')
+    if job is None:
+        return False
+    await queue._process(job, handler, breaker)
+    return True
+
+
+async def _dead_jobs(queue: RedisJobQueue) -> list:
+    entries = await queue.redis.xrange(queue.dead_key)
+    return [json.loads(fields['job']) for _, fields in entries]
+
+
+async def test_failing_job_is_retried_then_buried(queue, breaker):
+    calls = []
+
+    async def handler(job: QueueJob) -> None:
+        calls.append(job.attempt)
+        raise RuntimeError('api is down')
+
+    await queue.enqueue('kind', {'n': 1})
+    while await _run_once(queue, handler, breaker):
+        pass
+
+    assert calls == [0, 1, 2]
+    assert queue.stats.retried == 2
+    assert queue.stats.dead == 1
+    dead = await _dead_jobs(queue)
+    assert [job['attempt'] for job in dead] == [3]
+    assert await queue.counts() == {'queued': 0, 'delayed': 0, 'dead': 1}
+
+
+async def test_permanent_error_goes_to_dead_letters_at_once(queue, breaker):
+    async def handler(job: QueueJob) -> None:
+        raise PermanentJobError('bad request')
+
+    await queue.enqueue('kind', {'n': 1})
+    await _run_once(queue, handler, breaker)
+
+    assert queue.stats.dead == 1
+    assert queue.stats.retried == 0
+    # ответ сервиса был, предохранитель его сбоем не считает
+    assert breaker.as_log().endswith('recent_failures=0/1')
+
+
+async def test_rescheduled_job_keeps_payload_and_attempt(queue, breaker):
+    seen = []
+
+    async def handler(job: QueueJob) -> None:
+        seen.append((job.attempt, dict(job.payload)))
+        if 'step' not in job.payload:
+            job.payload['step'] = 1
+            raise RescheduleJob(0)
+
+    await queue.enqueue('kind', {'n': 1})
+    while await _run_once(queue, handler, breaker):
+        pass
+
+    assert seen == [(0, {'n': 1}), (0, {'n': 1, 'step': 1})]
+    assert queue.stats.rescheduled == 1
+    assert queue.stats.done == 1
+
+
+async def test_job_of_a_crashed_consumer_is_reclaimed(queue, breaker):
+    await queue.enqueue('kind', {'n': 1})
+    # потребитель забрал задачу и пропал, не подтвердив её
+    assert await queue._read('gone:0') is not None
+
+    await queue._reclaim()
+
+    assert queue.stats.reclaimed == 1
+    done = []
+
+    async def handler(job: QueueJob) -> None:
+        done.append(job.attempt)
+
+    assert await _run_once(queue, handler, breaker)
+    assert done == [1]
+    assert await queue.counts() == {'queued': 0, 'delayed': 0, 'dead': 0}
@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.services.timer_scripts import COMPLETE_TIMER
+from app.services.timers_service import (
+    _pause,
+    _start,
+    get_active_timer,
+    get_timer_deadline,
+    partition_of,
+    tick_timers,
+)
+
+
+pytestmark = pytest.mark.anyio
+
+TASK_ID = 7
+PLANNED = 3600
+
+
+def _ago(seconds: float) -> datetime:
+    return datetime.now(timezone.utc) - timedelta(seconds=seconds)
+
+
+async def _tick(redis, at: datetime):
+    ticks = await tick_timers(redis, at, [partition_of(TASK_ID)])
+    return {t.task_id: t for t in ticks}
+
+
+async def test_second_start_keeps_the_running_segment(redis):
+    await _start(redis, TASK_ID, _ago(200), 10, PLANNED, 1, 100)
+    ticked = await _tick(redis, _ago(100))
+    assert ticked[TASK_ID].total_seconds == 110
+
+    # повторный ▶️ с устаревшим spent_seconds из БД
+    transition = await _start(redis, TASK_ID, _ago(50), 10, PLANNED, 1, 200)
+
+    assert transition.total_seconds == 160
+    timer = await get_active_timer(redis, TASK_ID)
+    assert timer.accumulated_seconds == 160
+    assert timer.message_id == 200
+    ticked = await _tick(redis, _ago(0))
+    assert ticked[TASK_ID].total_seconds == 210
+    # отсчёт «после старта» для экрана остаётся от настоящего запуска
+    assert ticked[TASK_ID].resumed_seconds == 10
+    assert await get_timer_deadline(redis, TASK_ID) == pytest.approx(_ago(210).timestamp() + PLANNED, abs=1)
+
+
+async def test_second_start_takes_the_new_plan(redis):
+    await _start(redis, TASK_ID, _ago(100), 0, 60, 1, 100)
+    await _start(redis, TASK_ID, _ago(0), 0, 600, 1, 100)
+
+    timer = await get_active_timer(redis, TASK_ID)
+    assert timer.accumulated_seconds == 100
+    assert await get_timer_deadline(redis, TASK_ID) == pytest.approx(_ago(100).timestamp() + 600, abs=1)
+
+
+async def test_restore_does_not_touch_a_running_timer(redis):
+    await _start(redis, TASK_ID, _ago(100), 0, PLANNED, 1, 100)
+    assert await _start(redis, TASK_ID, _ago(0), 0, PLANNED, 1, 100, only_if_missing=True) is None
+    assert (await get_active_timer(redis, TASK_ID)).message_id == 100
+
+
+async def test_pause_counts_time_ticked_before_it(redis):
+    await _start(redis, TASK_ID, _ago(100), 0, PLANNED, 1, 100)
+    await _tick(redis, _ago(50))
+
+    transition = await _pause(redis, TASK_ID)
+
+    assert transition.total_seconds == 100
+    # тик, начатый до паузы, но выполненный после, таймер не воскрешает
+    assert await _tick(redis, _ago(0)) == {}
+    assert await get_active_timer(redis, TASK_ID) is None
+    assert await _pause(redis, TASK_ID) is None
+
+
+async def test_tick_older_than_the_segment_changes_nothing(redis):
+    await _start(redis, TASK_ID, _ago(10), 0, PLANNED, 1, 100)
+    before = await get_active_timer(redis, TASK_ID)
+
+    assert await _tick(redis, _ago(20)) == {}
+
+    assert await get_active_timer(redis, TASK_ID) == before
+
+
+async def test_completion_does_not_override_an_extension(redis):
+    await _start(redis, TASK_ID, _ago(100), 0, 60, 1, 100)
+    # план продлили после того, как воркер увидел просроченный дедлайн
+    await _pause(redis, TASK_ID)
+    await _start(redis, TASK_ID, _ago(0), 100, 400, 1, 100)
+
+    assert await _pause(redis, TASK_ID, COMPLETE_TIMER) is None
+    assert await get_active_timer(redis, TASK_ID) is not None
+
+    await _start(redis, 8, _ago(100), 0, 60, 1, 100)
+    transition = await _pause(redis, 8, COMPLETE_TIMER)
+    assert transition.total_seconds == 100
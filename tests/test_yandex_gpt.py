@@ -0,0 +1,36 @@
+import pytest
+
+from app.services.completion_cache import CompletionCache
+from app.services.yandex_gpt import CompletionError, YandexGPTClient
+
+
+pytestmark = pytest.mark.anyio
+
+PROMPT = 'Дата: 2026-10-18\nЗадач: 3, выполнено: 3'
+
+
+@pytest.fixture
+async def gpt(gpt_config, redis):
+    client = YandexGPTClient(gpt_config, CompletionCache(redis, ttl_seconds=60, max_entries=100, max_bytes=16384))
+    yield client
+    await client.aclose()
+
+
+async def _read(gpt: YandexGPTClient) -> list:
+    return [text async for text in gpt.stream(PROMPT)]
+
+
+async def test_finished_stream_is_cached(gpt):
+    chunks = await _read(gpt)
+
+    assert len(chunks) > 1
+    assert await gpt.cached_completion(PROMPT) == chunks[-1]
+
+
+async def test_stream_closed_before_the_final_chunk_is_an_error(gpt, fake_api):
+    fake_api.stream_closes_early = True
+
+    with pytest.raises(CompletionError):
+        await _read(gpt)
+
+    assert await gpt.cached_completion(PROMPT) is None